@@ -3,14 +3,89 @@ import axios from 'axios';
 
 const API_BASE_URL = 'http://localhost:8000/api'; 
 
-// GET request to fetch data from server
-export const getDishes = async () => {
-    const response = await fetch(`${API_BASE_URL}/dishes/`);
+// List endpoints are cursor paginated and return { next, previous, results }.
+// `path` may be relative to API_BASE_URL or a full `next`/`previous` link.
+export const fetchPage = async (path, token, params = {}) => {
+    const url = new URL(path.startsWith('http') ? path : `${API_BASE_URL}${path}`);
+    Object.entries(params).forEach(([key, value]) => {
+        if (value !== undefined && value !== null && value !== '') {
+            url.searchParams.set(key, value);
+        }
+    });
+    const response = await fetch(url, {
+        headers: token ? { Authorization: `Token ${token}` } : {},
+    });
     if (!response.ok) {
-        throw new Error('Failed to fetch dishes');
+        throw new Error(`Failed to fetch ${url.pathname}`);
     }
-    const data = await response.json();
-    return data;
+    return response.json();
+};
+
+// Follow `next` cursors until the list is exhausted.
+export const fetchAllPages = async (path, token, params = {}) => {
+    let page = await fetchPage(path, token, params);
+    const results = [...page.results];
+    while (page.next) {
+        page = await fetchPage(page.next, token);
+        results.push(...page.results);
+    }
+    return results;
+};
+
+// Media URLs in a snapshot are relative to the API server that published it
+const absoluteUrl = (url, base) => (url ? new URL(url, base).href : url);
+
+const absoluteSrcset = (srcset, base) =>
+    srcset
+        .split(', ')
+        .map((candidate) => {
+            const [url, width] = candidate.split(' ');
+            return `${absoluteUrl(url, base)} ${width}`;
+        })
+        .join(', ');
+
+// The whole customer menu, { categories, dishes }, from its published snapshot.
+// Only the small pointer request reaches the API; the snapshot itself is a
+// static file the browser keeps cached until the menu changes.
+export const getMenuSnapshot = async (token) => {
+    const pointer = await fetchPage('/menu/snapshot/', token);
+    const response = await fetch(pointer.url);
+    if (!response.ok) {
+        throw new Error('Failed to fetch the menu snapshot');
+    }
+    const menu = await response.json();
+    menu.dishes = menu.dishes.map((dish) => ({
+        ...dish,
+        image: absoluteUrl(dish.image, pointer.url),
+        image_srcset: Object.fromEntries(
+            Object.entries(dish.image_srcset || {}).map(([format, srcset]) => [
+                format,
+                absoluteSrcset(srcset, pointer.url),
+            ])
+        ),
+    }));
+    return menu;
+};
+
+// GET request to fetch one page of dishes; pass the previous page's cursor to continue
+export const getDishes = async (token, cursor) => {
+    return fetchPage('/dishes/', token, { cursor });
+};
+
+// The current user's ratings for many dishes at once, as { dishId: rating }
+// The batch endpoint caps each request at 500 dish ids; split larger menus
+// into chunks and merge the answers.
+const RATING_BATCH_SIZE = 500;
+
+export const getUserRatings = async (token, dishIds) => {
+    const chunks = [];
+    for (let start = 0; start < dishIds.length; start += RATING_BATCH_SIZE) {
+        chunks.push(dishIds.slice(start, start + RATING_BATCH_SIZE));
+    }
+    const pages = await Promise.all(
+        chunks.map((chunk) => fetchPage('/rates/batch/', token, { dish_ids: chunk.join(',') }))
+    );
+    return Object.assign({}, ...pages);
 };
 
 export const createDish = async (dish) => {
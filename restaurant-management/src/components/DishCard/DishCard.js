@@ -10,6 +10,7 @@ const DishCard = ({
   quantity,
   onDetails,
   averageRating,
+  userRating,
 }) => {
   const [rating, setRating] = useState(0); // User-selected rating
   const [previousRating, setPreviousRating] = useState(0); // User's previous rating
@@ -19,28 +20,11 @@ const DishCard = ({
   const [isEditing, setIsEditing] = useState(false); // Whether the user is editing their rating
   const { auth } = useAuth(); // Authentication hook
 
-  // Fetch the user's previous rating when the component mounts
+  // The parent loads every card's previous rating in one batch request
   useEffect(() => {
-    fetch(`http://127.0.0.1:8000/api/rates/${dish.id}`, {
-      method: "GET",
-      headers: {
-        Authorization: `Token ${auth.token}`,
-      },
-    })
-      .then((response) => {
-        if (!response.ok) {
-          throw new Error("Failed to fetch previous rating");
-        }
-        return response.json();
-      })
-      .then((data) => {
-        setPreviousRating(data.user_rating || 0); // Set previous rating if exists
-        setRating(data.user_rating || 0); // Initialize rating to previous value
-      })
-      .catch((error) => {
-        console.error("Error fetching previous rating:", error);
-      });
-  }, [dish.id, auth.token]);
+    setPreviousRating(userRating || 0); // Set previous rating if exists
+    setRating(userRating || 0); // Initialize rating to previous value
+  }, [userRating]);
 
   const handleRatingChange = (value) => {
     if (isEditing || previousRating === 0) {
@@ -107,11 +91,21 @@ const DishCard = ({
       <div className="card">
         <div className="card-image">
           <figure className="image is-4by3">
-            <img
-              src={dish.image || "https://via.placeholder.com/150"}
-              alt={dish.name}
-              style={{ objectFit: "cover" }}
-            />
+            <picture>
+              {/* Resized variants; the browser picks the smallest that fits the card */}
+              {dish.image_srcset?.webp && (
+                <source type="image/webp" srcSet={dish.image_srcset.webp} sizes="(max-width: 768px) 100vw, 25vw" />
+              )}
+              {dish.image_srcset?.jpeg && (
+                <source type="image/jpeg" srcSet={dish.image_srcset.jpeg} sizes="(max-width: 768px) 100vw, 25vw" />
+              )}
+              <img
+                src={dish.image || "https://via.placeholder.com/150"}
+                alt={dish.name}
+                loading="lazy"
+                style={{ objectFit: "cover" }}
+              />
+            </picture>
           </figure>
         </div>
         <div className="average-rating">
@@ -236,6 +230,7 @@ DishCard.propTypes = {
   onRemove: PropTypes.func.isRequired,
   quantity: PropTypes.number.isRequired,
   onDetails: PropTypes.func.isRequired,
+  userRating: PropTypes.number,
 };
 
 export default DishCard;
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from "react";
 import axios from "axios";
 import { useNavigate } from "react-router-dom";
 import { useAuth } from "../../hooks/useAuth";
+import { fetchAllPages } from "../../api/api";
 
 const EmployeeList = () => {
   const { auth } = useAuth();
@@ -31,11 +32,8 @@ const EmployeeList = () => {
     const fetchEmployees = async () => {
       setLoading(true);
       try {
-        const response = await axios.get(
-          "http://127.0.0.1:8000/api/employee/",
-          { headers: { Authorization: `Token ${auth.token}` } }
-        );
-        setEmployees(response.data);
+        const employeeList = await fetchAllPages("/employee/", auth.token);
+        setEmployees(employeeList);
       } catch (err) {
         setError("Failed to fetch employees. Please try again.");
       } finally {
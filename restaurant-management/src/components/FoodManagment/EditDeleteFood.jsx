@@ -4,6 +4,7 @@ import { useNavigate } from "react-router-dom";
 import { useAuth } from "../../hooks/useAuth";
 import "../../../node_modules/bulma/css/bulma.css";
 import "./EditDeleteFood.css";
+import { fetchAllPages } from "../../api/api";
 
 const EditDeleteFood = () => {
   const { auth } = useAuth();
@@ -29,15 +30,13 @@ const EditDeleteFood = () => {
     const fetchData = async () => {
       setLoading(true);
       try {
-        const [dishesResponse, categoriesResponse] = await Promise.all([
-          axios.get("http://127.0.0.1:8000/api/dishes/", {
-            headers: { Authorization: `Token ${auth.token}` },
-          }),
+        const [dishList, categoriesResponse] = await Promise.all([
+          fetchAllPages("/dishes/", auth.token),
           axios.get("http://127.0.0.1:8000/api/categories/", {
             headers: { Authorization: `Token ${auth.token}` },
           }),
         ]);
-        setDishes(dishesResponse.data);
+        setDishes(dishList);
         setCategories(categoriesResponse.data);
       } catch (err) {
         setError("Failed to fetch data. Please try again.");
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from "react";
-import axios from "axios";
 import { useAuth } from "../../hooks/useAuth"; // Assuming you have a custom hook for authentication
+import { fetchPage } from "../../api/api";
 import "./style.css"; // Add your styles here
 
 const CompletedOrders = () => {
@@ -8,15 +8,17 @@ const CompletedOrders = () => {
   const [orders, setOrders] = useState([]);
   const [error, setError] = useState("");
   const [successMessage, setSuccessMessage] = useState("");
+  const [nextPage, setNextPage] = useState(null);
 
   // Fetch completed orders on component mount
   useEffect(() => {
     const fetchCompletedOrders = async () => {
       try {
-        const response = await axios.get("http://127.0.0.1:8000/api/orders/completed/", {
-          headers: { Authorization: `Token ${auth.token}` },
+        const page = await fetchPage("/orders/history/", auth.token, {
+          status: "completed",
         });
-        setOrders(response.data);
+        setOrders(page.results);
+        setNextPage(page.next);
       } catch (err) {
         console.error("Error fetching completed orders:", err);
         setError("Failed to load completed orders. Please try again.");
@@ -26,6 +28,18 @@ const CompletedOrders = () => {
     fetchCompletedOrders();
   }, [auth.token]);
 
+  // Older orders are fetched a page at a time
+  const loadMore = async () => {
+    try {
+      const page = await fetchPage(nextPage, auth.token);
+      setOrders((prevOrders) => [...prevOrders, ...page.results]);
+      setNextPage(page.next);
+    } catch (err) {
+      console.error("Error fetching completed orders:", err);
+      setError("Failed to load completed orders. Please try again.");
+    }
+  };
+
   return (
     <div className="order-list">
       <h2>Completed Orders</h2>
@@ -66,6 +80,11 @@ const CompletedOrders = () => {
       ) : (
         <p>No completed orders available.</p>
       )}
+      {nextPage && (
+        <button className="button is-light" onClick={loadMore}>
+          Load more
+        </button>
+      )}
     </div>
   );
 };
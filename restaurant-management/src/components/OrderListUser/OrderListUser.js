@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from "react";
 import axios from "axios";
 import { useAuth } from "../../hooks/useAuth";
+import { fetchAllPages } from "../../api/api";
 import "./style.css";
 
 const OrderList = () => {
@@ -13,10 +14,10 @@ const OrderList = () => {
   useEffect(() => {
     const fetchPendingOrders = async () => {
       try {
-        const response = await axios.get("http://127.0.0.1:8000/api/orders/pending/", {
-          headers: { Authorization: `Token ${auth.token}` },
+        const pendingOrders = await fetchAllPages("/orders/history/", auth.token, {
+          status: "pending",
         });
-        setOrders(response.data); // Ensure the backend provides `pending_at` in the response
+        setOrders(pendingOrders); // Ensure the backend provides `pending_at` in the response
       } catch (err) {
         console.error("Error fetching pending orders:", err);
         setError("Failed to load pending orders. Please try again.");
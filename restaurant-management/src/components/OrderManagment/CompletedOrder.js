@@ -1,22 +1,22 @@
 import React, { useState, useEffect } from "react";
-import axios from "axios";
 import "../../../node_modules/bulma/css/bulma.css";
 import "./style.css";
+import { fetchPage } from "../../api/api";
 
 const EmployeeCompletedOrders = () => {
   const [completedOrders, setCompletedOrders] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [nextPage, setNextPage] = useState(null);
   const token = localStorage.getItem("authToken");
 
   useEffect(() => {
     const fetchCompletedOrders = async () => {
       setLoading(true);
       try {
-        const response = await axios.get("http://127.0.0.1:8000/api/completed-orders/", {
-          headers: { Authorization: `Token ${token}` },
-        });
-        setCompletedOrders(response.data);
+        const page = await fetchPage("/completed-orders/", token);
+        setCompletedOrders(page.results);
+        setNextPage(page.next);
       } catch (err) {
         setError("Failed to fetch completed orders.");
       } finally {
@@ -26,6 +26,16 @@ const EmployeeCompletedOrders = () => {
     fetchCompletedOrders();
   }, [token]);
 
+  const loadMore = async () => {
+    try {
+      const page = await fetchPage(nextPage, token);
+      setCompletedOrders((orders) => [...orders, ...page.results]);
+      setNextPage(page.next);
+    } catch (err) {
+      setError("Failed to fetch completed orders.");
+    }
+  };
+
   if (loading) return <div>Loading...</div>;
   if (error) return <div>{error}</div>;
 
@@ -63,6 +73,13 @@ const EmployeeCompletedOrders = () => {
           </div>
         ))}
       </div>
+      {nextPage && (
+        <div className="has-text-centered mb-6">
+          <button className="button is-light" onClick={loadMore}>
+            Load more
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -2,6 +2,10 @@ import React, { useState, useEffect } from "react";
 import axios from "axios";
 import "bulma/css/bulma.css";
 import "./style.css";
+import { fetchAllPages } from "../../api/api";
+
+// How often to reload the orders when the live stream is unavailable
+const ORDER_POLL_INTERVAL = 10000;
 
 const EmployeeOrders = () => {
   const [orders, setOrders] = useState([]);
@@ -10,12 +14,9 @@ const EmployeeOrders = () => {
   const token = localStorage.getItem("authToken");
   useEffect(() => {
     const fetchOrders = async () => {
-      setLoading(true);
       try {
-        const response = await axios.get("http://127.0.0.1:8000/api/orders/", {
-          headers: { Authorization: `Token ${token}` },
-        });
-        setOrders(response.data);
+        const pendingOrders = await fetchAllPages("/orders/", token);
+        setOrders(pendingOrders);
       } catch (err) {
         setError("Failed to fetch orders.");
       } finally {
@@ -23,6 +24,39 @@ const EmployeeOrders = () => {
       }
     };
     fetchOrders();
+
+    // Live updates: new orders and status changes are pushed by the server
+    const source = new EventSource(
+      `http://127.0.0.1:8000/api/orders/events/?token=${token}`
+    );
+    source.addEventListener("order-created", (event) => {
+      const order = JSON.parse(event.data);
+      setOrders((current) =>
+        current.some((o) => o.id === order.id) ? current : [order, ...current]
+      );
+    });
+    source.addEventListener("order-status-changed", (event) => {
+      const { id, status } = JSON.parse(event.data);
+      setOrders((current) =>
+        status === "pending"
+          ? current
+          : current.filter((order) => order.id !== id)
+      );
+    });
+    // The server could not replay what we missed; reload the full list
+    source.addEventListener("reset", fetchOrders);
+    // A source that closes on error won't reconnect: the server refused the
+    // stream, e.g. with a 501 under `manage.py runserver`. Poll instead.
+    let pollTimer = null;
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED && pollTimer === null) {
+        pollTimer = setInterval(fetchOrders, ORDER_POLL_INTERVAL);
+      }
+    };
+    return () => {
+      source.close();
+      clearInterval(pollTimer);
+    };
   }, [token]);
 
   const handleCompleteOrder = async (orderId) => {
@@ -43,12 +77,41 @@ const EmployeeOrders = () => {
     }
   };
 
+  const handleCompleteAll = async () => {
+    const pendingIds = orders
+      .filter((order) => order.status === "pending")
+      .map((order) => order.id);
+    if (pendingIds.length === 0) return;
+    try {
+      const response = await axios.post(
+        "http://127.0.0.1:8000/api/orders/bulk-status/",
+        { order_ids: pendingIds, status: "completed" },
+        { headers: { Authorization: `Token ${token}` } }
+      );
+      // Orders that were already completed or canceled elsewhere are dropped too
+      const handled = new Set(
+        response.data.results
+          .filter((result) => result.result !== "not_found")
+          .map((result) => result.id)
+      );
+      setOrders((current) => current.filter((order) => !handled.has(order.id)));
+    } catch (err) {
+      console.error("Failed to update order statuses:", err.response?.data || err.message);
+      setError("Failed to update order statuses.");
+    }
+  };
+
   if (loading) return <div>Loading...</div>;
   if (error) return <div>{error}</div>;
 
   return (
     <div className="container mt-5">
       <h1 className="title">Orders</h1>
+      {orders.length > 0 && (
+        <button className="button is-link mb-4" onClick={handleCompleteAll}>
+          Mark All as Completed
+        </button>
+      )}
       <div className="columns is-multiline">
         {orders.map((order) => (
           <div key={order.id} className="column is-one-quarter">
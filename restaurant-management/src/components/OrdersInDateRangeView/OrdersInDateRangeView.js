@@ -3,18 +3,31 @@ import axios from "axios";
 import { useAuth } from "../../hooks/useAuth"; // Import the useAuth hook
 import { FaSpinner } from "react-icons/fa"; // Import spinner icon for loading
 
+// The API takes a half-open range, so the chosen end date is sent as the next day
+const nextDay = (date) => {
+  const day = new Date(`${date}T00:00:00Z`);
+  day.setUTCDate(day.getUTCDate() + 1);
+  return day.toISOString().slice(0, 10);
+};
+
+const formatBucket = (start, interval) => {
+  // Bucket starts come back in the restaurant's time zone; show them as they are
+  if (interval === "hour") return start.slice(0, 16).replace("T", " ");
+  if (interval === "month") return start.slice(0, 7);
+  return start.slice(0, 10);
+};
+
 const OrdersReport = () => {
   const { auth } = useAuth(); // Get the auth object from the context
   const [startDate, setStartDate] = useState("");
   const [endDate, setEndDate] = useState("");
-  const [orders, setOrders] = useState([]);
-  const [totalRevenue, setTotalRevenue] = useState(0);
+  const [bucketInterval, setBucketInterval] = useState("day");
+  const [groupBy, setGroupBy] = useState("");
+  const [report, setReport] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
-  const [currentPage, setCurrentPage] = useState(1);
-  const [totalPages, setTotalPages] = useState(1);
 
-  const handleFetchData = async (page = 1) => {
+  const handleFetchData = async () => {
     if (!startDate || !endDate) {
       setError("Please enter both start and end dates.");
       return;
@@ -29,27 +42,35 @@ const OrdersReport = () => {
     setError("");
 
     try {
-      const response = await axios.get("http://127.0.0.1:8000/api/orders-in-date-range/", {
-        params: { start_date: startDate, end_date: endDate, page: page },
+      const response = await axios.get("http://127.0.0.1:8000/api/analytics/sales/", {
+        params: {
+          start: startDate,
+          end: nextDay(endDate),
+          interval: bucketInterval,
+          group_by: groupBy || undefined,
+        },
         headers: {
           Authorization: `Token ${auth.token}` // Use token from the useAuth hook
         }
       });
 
-      setOrders(response.data.orders);
-      setTotalRevenue(response.data.total_revenue);
-      setTotalPages(response.data.count / 10); // Calculate total pages (assuming 10 items per page)
-      setCurrentPage(page); // Update the current page
+      setReport(response.data);
     } catch (err) {
-      setError("Failed to fetch orders. Please try again.");
+      setError(err.response?.data?.error || "Failed to fetch orders. Please try again.");
     } finally {
       setLoading(false);
     }
   };
 
-  const handlePageChange = (page) => {
-    setCurrentPage(page);
-    handleFetchData(page);
+  // Download links can't carry headers, so the export takes the token as a query parameter
+  const exportUrl = (output) => {
+    const params = new URLSearchParams({
+      start: startDate,
+      end: nextDay(endDate),
+      output: output,
+      token: auth?.token || "",
+    });
+    return `http://127.0.0.1:8000/api/orders/export/?${params}`;
   };
 
   return (
@@ -82,42 +103,78 @@ const OrdersReport = () => {
         </div>
       </div>
 
+      <div className="field is-grouped">
+        <div className="control">
+          <label className="label" htmlFor="interval">Group by time:</label>
+          <div className="select">
+            <select id="interval" value={bucketInterval} onChange={(e) => setBucketInterval(e.target.value)}>
+              <option value="hour">Hour</option>
+              <option value="day">Day</option>
+              <option value="week">Week</option>
+              <option value="month">Month</option>
+            </select>
+          </div>
+        </div>
+        <div className="control">
+          <label className="label" htmlFor="group-by">Split by:</label>
+          <div className="select">
+            <select id="group-by" value={groupBy} onChange={(e) => setGroupBy(e.target.value)}>
+              <option value="">Nothing</option>
+              <option value="category">Category</option>
+              <option value="dish">Dish</option>
+            </select>
+          </div>
+        </div>
+      </div>
+
       <div className="field">
         <div className="control">
-          <button className="button is-primary is-fullwidth" onClick={() => handleFetchData(1)} disabled={loading}>
+          <button className="button is-primary is-fullwidth" onClick={handleFetchData} disabled={loading}>
             {loading ? <FaSpinner className="fa-spin" /> : "Fetch Orders"}
           </button>
         </div>
       </div>
 
+      {startDate && endDate && (
+        <div className="buttons">
+          <a className="button is-light" href={exportUrl("csv")}>Export CSV</a>
+          <a className="button is-light" href={exportUrl("ndjson")}>Export NDJSON</a>
+        </div>
+      )}
+
       {error && (
         <div className="notification is-danger">
           <strong>Error:</strong> {error}
         </div>
       )}
 
-      {orders.length > 0 && (
+      {report && report.buckets.length > 0 && (
         <>
           <h2 className="subtitle is-4">
-            Total Revenue: ${totalRevenue.toFixed(2)}
+            Total Revenue: ${parseFloat(report.totals.revenue).toFixed(2)}
           </h2>
+          <p className="mb-4">
+            {report.totals.orders} orders, {report.totals.quantity} items ({report.timezone} time)
+          </p>
           <div className="table-container">
             <table className="table is-bordered is-striped is-narrow is-hoverable is-fullwidth">
               <thead>
                 <tr>
-                  <th>Order ID</th>
-                  <th>Dish Name</th>
+                  <th>Period</th>
+                  {report.group_by && <th>{report.group_by === "dish" ? "Dish" : "Category"}</th>}
+                  <th>Orders</th>
                   <th>Quantity</th>
-                  <th>Price</th>
+                  <th>Revenue</th>
                 </tr>
               </thead>
               <tbody>
-                {orders.map((order) => (
-                  <tr key={order.id}>
-                    <td>{order.id}</td>
-                    <td>{order.dish_name}</td>
-                    <td>{order.quantity}</td>
-                    <td>${parseFloat(order.dish_price).toFixed(2)}</td>
+                {report.buckets.map((bucket) => (
+                  <tr key={`${bucket.start}-${bucket[`${report.group_by}_id`] ?? ""}`}>
+                    <td>{formatBucket(bucket.start, report.interval)}</td>
+                    {report.group_by && <td>{bucket[`${report.group_by}_name`]}</td>}
+                    <td>{bucket.orders}</td>
+                    <td>{bucket.quantity}</td>
+                    <td>${parseFloat(bucket.revenue).toFixed(2)}</td>
                   </tr>
                 ))}
               </tbody>
@@ -126,32 +183,11 @@ const OrdersReport = () => {
         </>
       )}
 
-      {orders.length === 0 && !loading && (
+      {report && report.buckets.length === 0 && !loading && (
         <div className="notification is-info">
           No orders found for the selected date range.
         </div>
       )}
-
-      {/* Pagination */}
-      {totalPages > 1 && (
-        <nav className="pagination is-centered" role="navigation" aria-label="pagination">
-          <button
-            className={`pagination-previous ${currentPage === 1 ? 'is-disabled' : ''}`}
-            onClick={() => handlePageChange(currentPage - 1)}
-            disabled={currentPage === 1}
-          >
-            Previous
-          </button>
-          <button
-            className={`pagination-next ${currentPage === totalPages ? 'is-disabled' : ''}`}
-            onClick={() => handlePageChange(currentPage + 1)}
-            disabled={currentPage === totalPages}
-          >
-            Next
-          </button>
-          <p className="pagination-total">{`Page ${currentPage} of ${Math.ceil(totalPages)}`}</p>
-        </nav>
-      )}
     </div>
   );
 };
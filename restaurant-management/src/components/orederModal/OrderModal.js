@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import axios from "axios";
 import "./style.css";
 import { useAuth } from "../../hooks/useAuth";
@@ -16,6 +16,8 @@ const Order = ({
   const [discountCode, setDiscountCode] = useState("");
   const [discountPercentage, setDiscountPercentage] = useState(0);
   const [discountedPrice, setDiscountedPrice] = useState(0);
+  // Reused when a submission is retried, so the server never places it twice
+  const idempotencyKey = useRef(null);
 
   // Fetch user's addresses
   useEffect(() => {
@@ -120,9 +122,16 @@ const Order = ({
 
       console.log("Sending Order Data:", orderData);
 
+      if (!idempotencyKey.current) {
+        idempotencyKey.current = crypto.randomUUID();
+      }
       await axios.post("http://127.0.0.1:8000/api/complete-order/", orderData, {
-        headers: { Authorization: `Token ${auth.token}` },
+        headers: {
+          Authorization: `Token ${auth.token}`,
+          "Idempotency-Key": idempotencyKey.current,
+        },
       });
+      idempotencyKey.current = null;
 
       setSuccessMessage("Order placed successfully!");
       setCart([]);
@@ -136,6 +145,10 @@ const Order = ({
       }, 3000);
     } catch (error) {
       console.error("Error completing order:", error);
+      // The server answered, so the next attempt is a new request
+      if (error.response && error.response.status < 500) {
+        idempotencyKey.current = null;
+      }
       alert("Failed to place the order. Please try again.");
     }
   };
@@ -13,6 +13,7 @@ import AddressForm from "../../components/AddressForm"; // Import the AddressFor
 import Card from "../../components/DishCard/DishCard"; // Import the reusable Card component
 import AddressModal from "../../components/AddressModal/AddressModal"; // Import the AddressModal component
 import Order from "../../components/orederModal/OrderModal";
+import { getMenuSnapshot, getUserRatings } from "../../api/api";
 const FoodList = () => {
   const [dishes, setDishes] = useState([]); // All dishes
   const [popularDishes, setPopularDishes] = useState([]); // Top 5 popular dishes
@@ -29,20 +30,21 @@ const FoodList = () => {
   const [isAddressModalOpen, setIsAddressModalOpen] = useState(false); // Address modal state
   const [selectedAddress, setSelectedAddress] = useState(null); // Selected address state
   const [cardAddress, setCardAddress] = useState(null);
+  const [userRatings, setUserRatings] = useState({}); // Current user's rating per dish id
 
   useEffect(() => {
     const fetchCategories = async () => {
       try {
         const response = await axios.get(
-          "http://127.0.0.1:8000/api/categories/",
+          "http://127.0.0.1:8000/api/categories/summary/",
           {
             headers: { Authorization: `Token ${auth.token}` },
           }
         );
 
-        // Filter categories that have dishes in them
-        const filteredCategories = response.data.filter((category) =>
-          dishes.some((dish) => dish.categoryName === category.name)
+        // Only active categories come back; keep the ones that have dishes in them
+        const filteredCategories = response.data.filter(
+          (category) => category.dish_count > 0
         );
         setCategories([{ name: "All" }, ...filteredCategories]);
       } catch (error) {
@@ -51,26 +53,30 @@ const FoodList = () => {
     };
 
     fetchCategories();
-  }, [auth.token, dishes]);
+  }, [auth.token]);
 
   useEffect(() => {
     const fetchDishes = async () => {
       try {
-        const response = await axios.get(
-          "http://127.0.0.1:8000/api/customer-dishes/",
-          {
-            params: {
-              category: visibleCategories.includes(currentCategory)
-                ? currentCategory === "All"
-                  ? ""
-                  : currentCategory
-                : "",
-            },
-            headers: { Authorization: `Token ${auth.token}` },
+        // The snapshot holds every dish; filter by category here
+        const snapshot = await getMenuSnapshot(auth.token);
+        const category = visibleCategories.includes(currentCategory) ? currentCategory : "All";
+        const menu =
+          category === "All"
+            ? snapshot.dishes
+            : snapshot.dishes.filter((dish) => dish.categoryName === category);
+
+        setDishes(menu); // Set all dishes
+
+        // Fetch the user's ratings for every dish shown; a failure here
+        // must not keep the popular dishes from loading
+        if (menu.length > 0) {
+          try {
+            setUserRatings(await getUserRatings(auth.token, menu.map((dish) => dish.id)));
+          } catch (error) {
+            console.error("Error fetching ratings:", error);
           }
-        );
-
-        setDishes(response.data); // Set all dishes
+        }
 
         // Fetch top 5 popular dishes
         const popularResponse = await axios.get(
@@ -426,6 +432,7 @@ const FoodList = () => {
               onRemove={removeFromCart}
               onDetails={handleOpenModal}
               quantity={cart.find((item) => item.id === dish.id)?.quantity || 0}
+              userRating={userRatings[dish.id] || 0}
             />
           </div>
         ))}
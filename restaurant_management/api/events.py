@@ -0,0 +1,129 @@
+"""
+In-process broadcaster for kitchen order events.
+
+Views publish ``order-created`` and ``order-status-changed`` events once
+their transaction commits; the ``orders/events/`` server-sent-events
+stream fans them out to subscribed kitchen screens. Recent events are kept
+so a reconnecting client can resume from its ``Last-Event-ID``; when that
+is no longer possible it gets a ``reset`` event and should refetch the
+order list.
+
+Everything lives in process memory, so each server process has its own
+stream. Event ids carry a per-process token, which makes ids from another
+process (or from before a restart) read as "can't resume".
+"""
+import asyncio
+import json
+import threading
+import uuid
+from collections import deque
+from dataclasses import dataclass
+
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+ORDER_CREATED = 'order-created'
+ORDER_STATUS_CHANGED = 'order-status-changed'
+RESET = 'reset'
+
+
+@dataclass(frozen=True)
+class Event:
+    seq: int
+    id: str
+    type: str
+    data: dict
+
+    def encode(self):
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, cls=JSONEncoder)}\n\n"
+
+
+class Subscription:
+    def __init__(self, loop, max_pending):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def push(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The subscriber's event loop has already shut down.
+            pass
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class OrderEventBroker:
+    def __init__(self, history_size=1000, max_pending=1000):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.max_pending = max_pending
+        self._seq = 0
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event_type, data):
+        with self._lock:
+            self._seq += 1
+            event = Event(self._seq, f'{self.epoch}:{self._seq}', event_type, data)
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+        return event
+
+    def subscribe(self, last_event_id=None):
+        """
+        Register the calling event loop for new events.
+
+        Returns the subscription and the backlog to send first: the events
+        after ``last_event_id``, or None if the client must reset.
+        """
+        subscription = Subscription(asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            backlog = self._backlog(last_event_id)
+            self._subscribers.add(subscription)
+        return subscription, backlog
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _backlog(self, last_event_id):
+        if not last_event_id:
+            return []
+        epoch, _, seq = last_event_id.partition(':')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if seq >= self._seq:
+            return []
+        if not self._history or self._history[0].seq > seq + 1:
+            return None
+        return [event for event in self._history if event.seq > seq]
+
+
+broker = OrderEventBroker()
+
+
+def reset_event():
+    return f"event: {RESET}\ndata: {{}}\n\n"
+
+
+def order_created(order):
+    """Announce a new order, with its items, once the transaction commits."""
+    from .serializers import PendingOrderSerializer
+
+    def publish():
+        broker.publish(ORDER_CREATED, PendingOrderSerializer(order).data)
+
+    transaction.on_commit(publish)
+
+
+def order_status_changed(order_id, new_status):
+    transaction.on_commit(lambda: broker.publish(ORDER_STATUS_CHANGED, {'id': order_id, 'status': new_status}))
@@ -0,0 +1,179 @@
+"""
+Static, content-hashed snapshots of the full customer menu.
+
+After a Dish or Category write, or a change in dish ratings, the menu is
+rendered to ``MENU_SNAPSHOT_ROOT/menu-<hash>.json`` together with
+pre-compressed ``.gz`` and ``.br`` siblings.
+``MenuSnapshotMiddleware`` serves those files with immutable caching, so
+clients only ask Python for the current hash.
+
+Publishing happens off the request path, ``MENU_SNAPSHOT_DELAY`` seconds
+after the first write, so a burst of edits or ratings is published once.
+
+The ``current`` file in ``MENU_SNAPSHOT_ROOT`` names the latest snapshot
+and the menu version it was rendered at. Every process reads it, so a
+publish made by any of them is picked up, and a publish that finishes
+after a newer one leaves it alone.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import re
+import threading
+
+import brotli
+from django.conf import settings
+from django.core.files import locks
+from django.db import close_old_connections
+from rest_framework.renderers import JSONRenderer
+
+from main.cache import get_menu_version
+from main.models import Category, Dish
+from .serializers import CategorySerializer, DishSerializer
+
+logger = logging.getLogger(__name__)
+
+POINTER_FILE = 'current'
+POINTER_LOCK_FILE = 'current.lock'
+SNAPSHOT_NAME_RE = re.compile(r'^menu-[0-9a-f]{16}\.json$')
+
+
+def snapshot_name(digest):
+    return f'menu-{digest}.json'
+
+
+def snapshot_url(digest):
+    return settings.MENU_SNAPSHOT_URL + snapshot_name(digest)
+
+
+def render_menu():
+    categories = Category.objects.order_by('id')
+    dishes = Dish.objects.select_related('category').order_by('-id')
+    return JSONRenderer().render({
+        'categories': CategorySerializer(categories, many=True).data,
+        'dishes': DishSerializer(dishes, many=True).data,
+    })
+
+
+def _write_atomic(path, content):
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+def read_pointer(root):
+    """The ``(digest, menu version)`` the pointer file names, or None."""
+    try:
+        with open(os.path.join(root, POINTER_FILE)) as f:
+            fields = f.read().split()
+    except FileNotFoundError:
+        return None
+    if not fields:
+        return None
+    return fields[0], int(fields[1]) if len(fields) > 1 else 0
+
+
+def point_to(root, digest, version):
+    """
+    Make ``digest`` the current snapshot unless the pointer already names
+    one rendered at a later menu version; returns the digest now current.
+
+    Two processes can finish their publishes in either order, so the
+    compare and replace happen under a lock file.
+    """
+    with open(os.path.join(root, POINTER_LOCK_FILE), 'wb') as lock_file:
+        locks.lock(lock_file, locks.LOCK_EX)
+        try:
+            current = read_pointer(root)
+            if current is not None and current[1] > version:
+                return current[0]
+            _write_atomic(os.path.join(root, POINTER_FILE), f'{digest} {version}'.encode())
+            return digest
+        finally:
+            locks.unlock(lock_file)
+
+
+def publish_menu_snapshot():
+    """Render the menu, write it under its content hash and point to it; returns the current hash."""
+    # Read before rendering, so the render includes every write the version covers.
+    version = get_menu_version()
+    payload = render_menu()
+    digest = hashlib.sha256(payload).hexdigest()[:16]
+    root = settings.MENU_SNAPSHOT_ROOT
+    os.makedirs(root, exist_ok=True)
+
+    path = os.path.join(root, snapshot_name(digest))
+    if not os.path.exists(path):
+        # Compressed variants first so they exist by the time the file is
+        # discoverable.
+        _write_atomic(f'{path}.gz', gzip.compress(payload, compresslevel=9, mtime=0))
+        _write_atomic(f'{path}.br', brotli.compress(payload))
+        _write_atomic(path, payload)
+
+    digest = point_to(root, digest, version)
+    prune_snapshots(keep=digest)
+    return digest
+
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def _publish_in_worker():
+    global _timer
+    with _timer_lock:
+        # Cleared before rendering, so a write made while this publish runs
+        # schedules another one instead of being folded into this render.
+        _timer = None
+    close_old_connections()
+    try:
+        publish_menu_snapshot()
+    except Exception:
+        logger.exception("Failed to publish the menu snapshot")
+    finally:
+        close_old_connections()
+
+
+def schedule_publish():
+    """Publish a new snapshot soon, unless one is already scheduled."""
+    global _timer
+    if not settings.MENU_SNAPSHOT_DELAY:
+        publish_menu_snapshot()
+        return
+    with _timer_lock:
+        if _timer is not None:
+            return
+        # Not a daemon thread: a management command waits for its publish
+        # before exiting.
+        _timer = threading.Timer(settings.MENU_SNAPSHOT_DELAY, _publish_in_worker)
+        _timer.name = 'menu-snapshot'
+        _timer.start()
+
+
+def prune_snapshots(keep):
+    """Delete all but the newest MENU_SNAPSHOT_KEEP snapshots (never ``keep``)."""
+    root = settings.MENU_SNAPSHOT_ROOT
+    snapshots = sorted(
+        (entry for entry in os.scandir(root) if SNAPSHOT_NAME_RE.match(entry.name)),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in snapshots[settings.MENU_SNAPSHOT_KEEP:]:
+        if entry.name == snapshot_name(keep):
+            continue
+        for suffix in ('', '.gz', '.br'):
+            try:
+                os.remove(entry.path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+def current_snapshot_hash():
+    """The hash named by the pointer file, publishing a snapshot if there is none."""
+    root = settings.MENU_SNAPSHOT_ROOT
+    current = read_pointer(root)
+    if current is None or not os.path.exists(os.path.join(root, snapshot_name(current[0]))):
+        return publish_menu_snapshot()
+    return current[0]
@@ -0,0 +1,44 @@
+import os
+
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .menu_snapshot import SNAPSHOT_NAME_RE
+
+
+class MenuSnapshotMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that also serves published menu snapshots.
+
+    Snapshots are written while the server runs, so a request for one
+    WhiteNoise hasn't seen yet registers it on first use. Their names carry
+    a content hash, so they are cached as immutable.
+    """
+
+    def __init__(self, get_response=None, settings=settings):
+        # Set before WhiteNoise starts scanning, which calls immutable_file_test().
+        self.snapshot_root = settings.MENU_SNAPSHOT_ROOT
+        self.snapshot_prefix = settings.MENU_SNAPSHOT_URL
+        super().__init__(get_response, settings=settings)
+        # Nothing may have been published yet on a fresh checkout.
+        os.makedirs(self.snapshot_root, exist_ok=True)
+        self.add_files(self.snapshot_root, prefix=self.snapshot_prefix)
+
+    def __call__(self, request):
+        path = request.path_info
+        if not self.autorefresh and path.startswith(self.snapshot_prefix) and path not in self.files:
+            self.add_snapshot(path)
+        return super().__call__(request)
+
+    def add_snapshot(self, url):
+        name = url[len(self.snapshot_prefix):]
+        if not SNAPSHOT_NAME_RE.match(name):
+            return
+        path = os.path.join(self.snapshot_root, name)
+        if os.path.isfile(path):
+            self.add_file_to_dictionary(url, path)
+
+    def immutable_file_test(self, path, url):
+        if url.startswith(self.snapshot_prefix):
+            return True
+        return super().immutable_file_test(path, url)
@@ -0,0 +1,54 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key, newest first.
+
+    The cursor is DRF's opaque base64 token, so pages stay stable while
+    rows are inserted, and each page is a single indexed range query.
+    """
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class MergedIdCursorPagination(IdCursorPagination):
+    """
+    The same keyset pagination over several querysets whose ids never clash,
+    such as live and archived orders.
+
+    Each queryset is read up to one page below the ``before`` id and the rows
+    are merged, so a page costs one range query per queryset. The response
+    envelope matches ``IdCursorPagination``; only forward links are given.
+    """
+    cursor_query_param = 'before'
+
+    def paginate_querysets(self, querysets, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        before = request.query_params.get(self.cursor_query_param)
+        if before is not None and not before.isdigit():
+            raise NotFound(self.invalid_cursor_message)
+
+        rows = []
+        for queryset in querysets:
+            if before is not None:
+                queryset = queryset.filter(id__lt=int(before))
+            rows.extend(queryset.order_by('-id')[:page_size + 1])
+        rows.sort(key=lambda row: row.id, reverse=True)
+
+        page = rows[:page_size]
+        self.next_id = page[-1].id if len(rows) > page_size else None
+        return page
+
+    def get_next_link(self):
+        if self.next_id is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_id)
+
+    def get_previous_link(self):
+        return None
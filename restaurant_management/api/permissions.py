@@ -2,28 +2,25 @@
 
 from rest_framework.permissions import BasePermission
 
+from main.models import CustomUser
+
+
 class IsManager(BasePermission):
     """
     Custom permission to grant access only to users with 'manager' role.
     """
 
-    class IsManager(BasePermission):
-        def has_permission(self, request, view):
-            user = request.user
-            if user.is_authenticated and user.role == 'manager':
-                print(f"Manager user: {user.username} is authenticated.")
-                return True
-            return False
-        
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and user.role == CustomUser.MANAGER)
+
+
 class IsEmployee(BasePermission):
     """
-    Custom permission to grant access only to users with 'manager' role.
+    Custom permission to grant access only to kitchen staff: users with the
+    'employee' role, and managers, who oversee the kitchen.
     """
 
-    class IsEmployee(BasePermission):
-        def has_permission(self, request, view):
-            user = request.user
-            if user.is_authenticated and user.role == 'employee':
-                print(f"employee user: {user.username} is authenticated.")
-                return True
-            return False
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and user.role in (CustomUser.EMPLOYEE, CustomUser.MANAGER))
@@ -1,16 +1,83 @@
 from rest_framework import serializers
 from main.models import Dish, Order, OrderItem, Category, CustomUser,Review,Address,DiscountCode,UserDiscount
 from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from main.images import variant_urls
+
+
+def image_srcset(obj, request):
+    """srcset strings per format for ``obj``'s resized image variants."""
+    def build_url(name):
+        url = default_storage.url(name)
+        return request.build_absolute_uri(url) if request else url
+    return variant_urls(obj.image_variants, build_url)
+
 
 class DishSerializer(serializers.ModelSerializer):
+    """
+    Read requests can ask for a subset of fields with ``?fields=id,name,price``
+    or for the compact list representation with ``?view=compact``.
+    """
     category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), allow_null=False, required=True)
     image = serializers.ImageField(use_url=True, required=False)
     categoryName = serializers.CharField(source='category.name', read_only=True)
     average_rating = serializers.ReadOnlyField()
+    image_srcset = serializers.SerializerMethodField()
+
+    COMPACT_FIELDS = ['id', 'name', 'price']
+    # Model columns each field reads, so querysets can be narrowed with only().
+    FIELD_COLUMNS = {
+        'id': ['id'],
+        'name': ['name'],
+        'description': ['description'],
+        'category': ['category_id'],
+        'categoryName': ['category__name'],
+        'price': ['price'],
+        'image': ['image'],
+        'image_srcset': ['image_variants'],
+        'created_at': ['created_at'],
+        'modified_at': ['modified_at'],
+        'average_rating': ['average_rating'],
+    }
 
     class Meta:
         model = Dish
-        fields = ['id', 'name', 'description', 'category', 'categoryName', 'price', 'image', 'created_at', 'modified_at','average_rating']
+        fields = ['id', 'name', 'description', 'category', 'categoryName', 'price', 'image', 'image_srcset', 'created_at', 'modified_at','average_rating']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.requested_fields(self.context.get('request'))
+        if requested is not None:
+            for field_name in set(self.fields) - set(requested):
+                self.fields.pop(field_name)
+
+    @classmethod
+    def requested_fields(cls, request):
+        """The field names a GET request asked for, or None for all of them."""
+        if request is None or request.method != 'GET':
+            return None
+        fields_param = request.query_params.get('fields')
+        if fields_param:
+            requested = [name.strip() for name in fields_param.split(',') if name.strip() in cls.FIELD_COLUMNS]
+            return requested or None
+        if request.query_params.get('view') == 'compact':
+            return cls.COMPACT_FIELDS
+        return None
+
+    @classmethod
+    def narrow_queryset(cls, queryset, request):
+        """Load only the columns (and join) the requested fields need."""
+        requested = cls.requested_fields(request)
+        if requested is None:
+            return queryset
+        columns = {'id'}
+        for field_name in requested:
+            columns.update(cls.FIELD_COLUMNS[field_name])
+        if 'category__name' in columns:
+            queryset = queryset.select_related('category')
+        else:
+            queryset = queryset.select_related(None)
+        return queryset.only(*columns)
 
     def validate_price(self, value):
         if value < 0:
@@ -26,6 +93,9 @@ class DishSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
     
+    def get_image_srcset(self, obj):
+        return image_srcset(obj, self.context.get('request'))
+
     def get_image(self, obj):
         request = self.context.get('request')
         if obj.image and request:
@@ -39,15 +109,28 @@ class OrderSerializer(serializers.ModelSerializer):
 
 class OrderItemSerializer(serializers.ModelSerializer):
     dish_name = serializers.CharField(source='dish.name')
-    dish_price = serializers.CharField(source='dish.price')
+    dish_price = serializers.CharField(source='unit_price')  # The price paid, not today's menu price
     class Meta:
         model = OrderItem
-        fields = ['id', 'quantity', 'dish_name','dish_price']
+        fields = ['id', 'quantity', 'dish_name','dish_price', 'line_total']
 
 class CategorySerializer(serializers.ModelSerializer):
+    image_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Category
-        fields = ['id', 'name']
+        fields = ['id', 'name', 'image_srcset']
+
+    def get_image_srcset(self, obj):
+        return image_srcset(obj, self.context.get('request'))
+
+class CategorySummarySerializer(CategorySerializer):
+    dish_count = serializers.IntegerField(read_only=True)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + ['dish_count', 'min_price', 'max_price']
 
 class EmployeeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -99,10 +182,23 @@ class PendingOrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['id', 'status', 'total_price', 'address', 'items', 'created_at']
 
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation['total_price'] = instance.calculate_total_price
-        return representation
+class OrderHistoryItemSerializer(serializers.ModelSerializer):
+    dish_name = serializers.CharField(source='dish.name')
+
+    class Meta:
+        model = OrderItem
+        fields = ['dish_name', 'quantity']
+
+class OrderHistorySerializer(serializers.ModelSerializer):
+    """A customer's own order, as listed in their order history."""
+    address = serializers.StringRelatedField()
+    total_price = serializers.FloatField()
+    pending_at = serializers.DateTimeField(source='created_at')
+    items = OrderHistoryItemSerializer(many=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'address', 'total_price', 'created_at', 'pending_at', 'status', 'items']
 
 class TopDishSerializer(serializers.ModelSerializer):
     order_count = serializers.IntegerField(source='orderitem__count', read_only=True)
@@ -143,6 +239,12 @@ class DiscountCodeSerializer(serializers.ModelSerializer):
     class Meta:
         model = DiscountCode
         fields = ['id', 'code', 'discount_percentage', 'expiration_date', 'is_active']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # A code past its expiration date is inactive even before the sweep command catches up
+        data['is_active'] = instance.is_valid()
+        return data
         
         
 class ApplyDiscountCodeSerializer(serializers.Serializer):
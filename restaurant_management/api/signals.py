@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from main.images import variants_saved
+from main.models import Category, Dish, dish_ratings_changed, orders_transitioned
+from . import events
+from .menu_snapshot import schedule_publish
+
+
+@receiver(post_save, sender=Dish)
+@receiver(post_delete, sender=Dish)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(variants_saved)
+@receiver(dish_ratings_changed)
+def republish_menu_snapshot(sender, **kwargs):
+    transaction.on_commit(schedule_publish)
+
+
+@receiver(orders_transitioned)
+def announce_status_changes(sender, order_ids, status, **kwargs):
+    # Every transition reaches the kitchen screens: views, the admin action
+    # and the stale order sweep alike.
+    for order_id in order_ids:
+        events.order_status_changed(order_id, status)
@@ -1,11 +1,12 @@
 from rest_framework import generics
 from rest_framework.generics import ListCreateAPIView
-from main.models import Dish, Order, OrderItem, Category, CustomUser,Review,Address,DiscountCode,UserDiscount
+from main.models import Dish, Order, OrderItem, Category, CustomUser,Review,Address,DiscountCode,UserDiscount,IdempotencyKey,DailyDishSales
 from .serializers import (
     DishSerializer,
     OrderSerializer,
     OrderItemSerializer,
     CategorySerializer,
+    CategorySummarySerializer,
     EmployeeSerializer,
     CustomerRegistrationSerializer,
     PendingOrderSerializer,
@@ -14,6 +15,7 @@ from .serializers import (
     DiscountCodeSerializer,
     ApplyDiscountCodeSerializer,
     CompletedOrderSerializer,
+    OrderHistorySerializer,
 )
 from rest_framework.pagination import PageNumberPagination
 from datetime import timedelta
@@ -24,6 +26,8 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.mixins import ListModelMixin, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, DestroyModelMixin
 from rest_framework.generics import GenericAPIView, ListAPIView
 from .permissions import IsManager, IsEmployee
+from .pagination import IdCursorPagination, MergedIdCursorPagination
+from . import events, exports
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -32,14 +36,30 @@ from django.contrib.auth.hashers import make_password
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.authentication import TokenAuthentication
 from django.shortcuts import get_object_or_404
-from django.db.models import Count    
+from django.db.models import Count, Max, Min
 import logging
 from rest_framework.exceptions import ValidationError
-from django.db.models import Sum,F
+from django.db.models import Sum,F,Q
+from django.db import IntegrityError, transaction
+from rest_framework.renderers import JSONRenderer
+from django.core.handlers.asgi import ASGIRequest
+from django.core.cache import cache
+from django.http import JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from main.cache import get_menu_version
+from main import analytics, ranking, reports, rollup, search
+from main.archive import item_querysets, order_querysets
+from .menu_snapshot import current_snapshot_hash, snapshot_url
+import asyncio
+import hashlib
+import json
 
 
 logger = logging.getLogger(__name__)
 
+# Seconds between keepalive comments on an idle order event stream.
+ORDER_STREAM_KEEPALIVE = 15
+
 class DishAPIView(
     GenericAPIView,
     ListModelMixin,
@@ -49,8 +69,12 @@ class DishAPIView(
     DestroyModelMixin
 ):
     permission_classes = [IsAuthenticated, IsManager]
-    queryset = Dish.objects.all().order_by('-id')
+    queryset = Dish.objects.select_related('category').order_by('-id')
     serializer_class = DishSerializer
+    pagination_class = IdCursorPagination
+
+    def get_queryset(self):
+        return DishSerializer.narrow_queryset(super().get_queryset(), self.request)
 
     def get(self, request, *args, **kwargs):
         if 'pk' in kwargs:
@@ -74,6 +98,27 @@ class CategoryListAPIView(ListAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
+class CategorySummaryAPIView(APIView):
+    """
+    Active categories with their dish count and price range, from one
+    grouped query. Cached under the menu version, so any Dish or Category
+    change refreshes it.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        cache_key = f'menu:{get_menu_version()}:categories:{request.get_host()}'
+        data = cache.get(cache_key)
+        if data is None:
+            categories = (
+                Category.objects.filter(is_active=True)
+                .annotate(dish_count=Count('dishes'), min_price=Min('dishes__price'), max_price=Max('dishes__price'))
+                .order_by('id')
+            )
+            data = CategorySummarySerializer(categories, many=True, context={'request': request}).data
+            cache.set(cache_key, data, settings.MENU_CACHE_TIMEOUT)
+        return Response(data, status=status.HTTP_200_OK)
+
 class CustomAuthTokenView(APIView):
     permission_classes = [AllowAny]
     authentication_classes = [TokenAuthentication]
@@ -105,6 +150,7 @@ class EmployeeAPIView(
     permission_classes = [IsAuthenticated, IsManager]
     queryset = CustomUser.objects.filter(role="employee").order_by("-id")
     serializer_class = EmployeeSerializer
+    pagination_class = IdCursorPagination
 
     def get(self, request, *args, **kwargs):
         if "pk" in kwargs:
@@ -160,23 +206,142 @@ class CustomerRegistrationAPIView(APIView):
 
 class CustomerDishListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
-    queryset = Dish.objects.all()
+    queryset = Dish.objects.select_related('category')
     serializer_class = DishSerializer
-    filter_backends = [SearchFilter, OrderingFilter]
+    pagination_class = IdCursorPagination
+    filter_backends = [OrderingFilter]
     filterset_fields = ['category__name']
-    search_fields = ['category__name']
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = DishSerializer.narrow_queryset(super().get_queryset(), self.request)
         category_name = self.request.query_params.get('category', None)
         if category_name and category_name != 'All':
             queryset = queryset.filter(category__name=category_name)
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        # Searches are too varied to be worth caching.
+        term = request.query_params.get('search', '').strip()
+        if term:
+            return self.ranked_search(request, term)
+
+        version = get_menu_version()
+        variant = '|'.join([
+            request.get_host(),
+            request.query_params.get('category') or 'All',
+            request.query_params.get('ordering', ''),
+            request.query_params.get('cursor', ''),
+            request.query_params.get('page_size', ''),
+            request.query_params.get('fields', ''),
+            request.query_params.get('view', ''),
+        ])
+        variant_hash = hashlib.md5(variant.encode()).hexdigest()
+        etag = f'"menu-{version}-{variant_hash}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        cache_key = f'menu:{version}:{variant_hash}'
+        data = cache.get(cache_key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(cache_key, data, settings.MENU_CACHE_TIMEOUT)
+        return Response(data, headers=headers)
+
+    def ranked_search(self, request, term):
+        """
+        Return the best full-text matches for ``term``, ranked by relevance.
+
+        Results come back in the paginated envelope but as a single page,
+        since rank order can't be walked with an id cursor.
+        """
+        limit = self.paginator.get_page_size(request)
+        queryset = self.get_queryset()
+        if search.fts_available():
+            category_name = request.query_params.get('category')
+            dish_ids = search.search_dish_ids(
+                term, limit=limit, category=category_name if category_name != 'All' else None
+            )
+            rank = {dish_id: position for position, dish_id in enumerate(dish_ids)}
+            dishes = sorted(queryset.filter(id__in=dish_ids), key=lambda dish: rank[dish.id])
+        else:
+            dishes = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))[:limit]
+        serializer = self.get_serializer(dishes, many=True)
+        return Response({'next': None, 'previous': None, 'results': serializer.data})
+
+class MenuSnapshotView(APIView):
+    """
+    Points clients at the current pre-rendered menu snapshot.
+
+    The snapshot itself is a static, immutable file; only this small
+    pointer has to be revalidated.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        digest = current_snapshot_hash()
+        return Response(
+            {'hash': digest, 'url': request.build_absolute_uri(snapshot_url(digest))},
+            headers={'Cache-Control': 'private, no-cache'},
+        )
+
 class CompleteOrderAPIView(APIView):
+    """
+    Places an order from the cart.
+
+    Clients may send an ``Idempotency-Key`` header; a retry with the same
+    key and body gets the original response back instead of a second order.
+    """
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return self.place_order(request)
+        if len(key) > 255:
+            return Response({"error": "Idempotency-Key must be at most 255 characters"}, status=status.HTTP_400_BAD_REQUEST)
+
+        request_hash = hashlib.sha256(
+            json.dumps(request.data, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        replay = self.replay(request.user, key, request_hash)
+        if replay is not None:
+            return replay
+
+        try:
+            with transaction.atomic():
+                response = self.place_order(request)
+                # Failed requests changed nothing, so they may be retried as is.
+                if status.is_success(response.status_code):
+                    IdempotencyKey.objects.create(
+                        user=request.user,
+                        key=key,
+                        request_hash=request_hash,
+                        response_status=response.status_code,
+                        response_body=json.loads(JSONRenderer().render(response.data)),
+                    )
+        except IntegrityError:
+            # A concurrent retry with the same key won; ours was rolled back.
+            return self.replay(request.user, key, request_hash)
+        return response
+
+    def replay(self, user, key, request_hash):
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None:
+            return None
+        if record.created_at < timezone.now() - settings.IDEMPOTENCY_KEY_TTL:
+            record.delete()
+            return None
+        if record.request_hash != request_hash:
+            return Response(
+                {"error": "Idempotency-Key was already used for a different request"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(record.response_body, status=record.response_status, headers={'Idempotent-Replayed': 'true'})
+
+    def place_order(self, request):
         user = request.user
         address_id = request.data.get('address')  # The address ID sent in the request
         items = request.data.get('items', [])
@@ -191,46 +356,149 @@ class CompleteOrderAPIView(APIView):
         except Address.DoesNotExist:
             return Response({"error": "Address not found or does not belong to the user"}, status=status.HTTP_400_BAD_REQUEST)
 
-        total_price = 0
-        # Create the order and associate the correct address
-        order = Order.objects.create(user=user, address=address)
-
+        # Validate the whole cart before writing anything
+        lines = []
         for item in items:
-            # Get the dish instance
             try:
-                dish = Dish.objects.get(id=item['id'])
-            except Dish.DoesNotExist:
-                return Response({"error": f"Dish with id {item['id']} not found"}, status=status.HTTP_400_BAD_REQUEST)
-
-            quantity = item['quantity']
-            price = dish.price * quantity
-            total_price += price
-
-            # Create order item
-            OrderItem.objects.create(order=order, dish=dish, quantity=quantity)
-
-        # Update the total price of the order
-        order.total_price = total_price
-        order.save()
+                dish_id = int(item['id'])
+                quantity = int(item['quantity'])
+            except (KeyError, TypeError, ValueError):
+                return Response({"error": "Each item needs an integer id and quantity"}, status=status.HTTP_400_BAD_REQUEST)
+            if quantity < 1:
+                return Response({"error": f"Invalid quantity for dish with id {dish_id}"}, status=status.HTTP_400_BAD_REQUEST)
+            lines.append((dish_id, quantity))
+
+        dishes = Dish.objects.only('id', 'price').in_bulk({dish_id for dish_id, _ in lines})
+        for dish_id, _ in lines:
+            if dish_id not in dishes:
+                return Response({"error": f"Dish with id {dish_id} not found"}, status=status.HTTP_400_BAD_REQUEST)
+
+        total_price = sum(dishes[dish_id].price * quantity for dish_id, quantity in lines)
+
+        # Create the order with its final total and all of its items at once
+        with transaction.atomic():
+            order = Order.objects.create(user=user, address=address, total_price=total_price)
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    dish=dishes[dish_id],
+                    quantity=quantity,
+                    unit_price=dishes[dish_id].price,
+                    line_total=dishes[dish_id].price * quantity,
+                )
+                for dish_id, quantity in lines
+            ])
+            rollup.add_orders([order.id])
+            events.order_created(order)
 
         return Response({"message": "Order completed successfully", "total_price": total_price})
 
+def order_transition_failed(orders):
+    """404 if the order doesn't exist, otherwise 409: it has already moved on."""
+    current_status = orders.values_list('status', flat=True).first()
+    if current_status is None:
+        return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(
+        {"error": f"Order is already {current_status}", "status": current_status},
+        status=status.HTTP_409_CONFLICT,
+    )
+
 class EmployeePendingOrdersView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsEmployee]
 
     def get(self, request):
-        pending_orders = Order.objects.filter(status='pending')
-        serializer = PendingOrderSerializer(pending_orders, many=True)
-        return Response(serializer.data)
+        pending_orders = (
+            Order.objects.filter(status='pending')
+            .select_related('address')
+            .prefetch_related('items__dish')
+        )
+        paginator = IdCursorPagination()
+        page = paginator.paginate_queryset(pending_orders, request, view=self)
+        serializer = PendingOrderSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def patch(self, request, pk):
-        order = Order.objects.get(pk=pk, status='pending')
-        order.status = 'completed'
-        order.save()
+        if not Order.objects.filter(pk=pk).transition(Order.COMPLETED):
+            return order_transition_failed(Order.objects.filter(pk=pk))
         return Response({'status': 'Order status updated to completed'}, status=status.HTTP_200_OK)
 
+async def token_user(request):
+    """
+    The active user owning the request's token, from ``Authorization: Token``
+    or ``?token=`` (for EventSource and download links, which can't send
+    headers); None if there is none.
+    """
+    token_key = request.GET.get('token')
+    auth_header = request.headers.get('Authorization', '')
+    if not token_key and auth_header.startswith('Token '):
+        token_key = auth_header[len('Token '):]
+    token = await Token.objects.select_related('user').filter(key=token_key).afirst() if token_key else None
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+def asgi_required(request):
+    """
+    A 501 response when ``request`` isn't served over ASGI. Django's WSGI
+    handler drains an async streaming response into memory before sending
+    anything, so an endless stream would never send a byte.
+    """
+    if isinstance(request, ASGIRequest):
+        return None
+    return JsonResponse(
+        {'error': 'This endpoint streams its response and needs an ASGI server, '
+                  'e.g. uvicorn restaurant_management.asgi:application.'},
+        status=status.HTTP_501_NOT_IMPLEMENTED,
+    )
+
+async def order_event_stream(request):
+    """
+    Server-sent events feed of new orders and status changes for kitchen
+    screens. EventSource can't send headers, so the token may be passed as
+    ``?token=``. Reconnects resume from the ``Last-Event-ID`` header (or
+    ``?last_event_id=``). Needs an ASGI server to hold many streams open.
+    """
+    not_asgi = asgi_required(request)
+    if not_asgi is not None:
+        return not_asgi
+    user = await token_user(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+    if user.role not in (CustomUser.EMPLOYEE, CustomUser.MANAGER):
+        return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=status.HTTP_403_FORBIDDEN)
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+
+    async def stream():
+        subscription, backlog = events.broker.subscribe(last_event_id)
+        try:
+            yield 'retry: 3000\n\n'
+            if backlog is None:
+                yield events.reset_event()
+            else:
+                for event in backlog:
+                    yield event.encode()
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=ORDER_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                if subscription.overflowed:
+                    # This client fell too far behind to be caught up event by event.
+                    yield events.reset_event()
+                    return
+                yield event.encode()
+        finally:
+            events.broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 class UpdateOrderStatusView(generics.UpdateAPIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsEmployee]
     serializer_class = PendingOrderSerializer
 
     def get_queryset(self):
@@ -238,33 +506,90 @@ class UpdateOrderStatusView(generics.UpdateAPIView):
         return Order.objects.filter(user=user, status='pending')
 
     def patch(self, request, order_id):
-        order = get_object_or_404(Order, id=order_id)
         status_update = request.data.get('status')
-        if status_update not in ['completed', 'canceled']:
+        if status_update not in [Order.COMPLETED, Order.CANCELED]:
             return Response({"error": "Invalid status"}, status=status.HTTP_400_BAD_REQUEST)
-        order.status = status_update
-        order.save()
+        if not Order.objects.filter(id=order_id).transition(status_update):
+            return order_transition_failed(Order.objects.filter(id=order_id))
         return Response({"message": "Order status updated successfully"}, status=status.HTTP_200_OK)
 
+class BulkOrderStatusView(APIView):
+    """
+    Move a batch of orders to one status in a single UPDATE, e.g. when the
+    kitchen clears its finished tickets at the end of a rush.
+
+    Body: ``{"order_ids": [1, 2, 3], "status": "completed"}``. The response
+    lists every id as ``updated``, ``conflict`` (with its current status) or
+    ``not_found``.
+    """
+    permission_classes = [IsAuthenticated, IsEmployee]
+    max_orders = 200
+
+    def post(self, request):
+        status_update = request.data.get('status')
+        if status_update not in [Order.COMPLETED, Order.CANCELED]:
+            return Response({"error": "Invalid status"}, status=status.HTTP_400_BAD_REQUEST)
+
+        order_ids = request.data.get('order_ids')
+        if not isinstance(order_ids, list) or not order_ids:
+            return Response({"error": "order_ids must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(order_ids) > self.max_orders:
+            return Response(
+                {"error": f"At most {self.max_orders} orders can be updated at once"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            order_ids = list(dict.fromkeys(int(order_id) for order_id in order_ids))
+        except (TypeError, ValueError):
+            return Response({"error": "order_ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        moved = set(Order.objects.filter(id__in=order_ids).transition_ids(status_update))
+
+        # Whatever the UPDATE skipped either had already moved on or doesn't exist.
+        current = dict(
+            Order.objects.filter(id__in=[order_id for order_id in order_ids if order_id not in moved])
+            .values_list('id', 'status')
+        )
+        results = []
+        for order_id in order_ids:
+            if order_id in moved:
+                results.append({'id': order_id, 'result': 'updated'})
+            elif order_id in current:
+                results.append({'id': order_id, 'result': 'conflict', 'status': current[order_id]})
+            else:
+                results.append({'id': order_id, 'result': 'not_found'})
+        return Response(
+            {'status': status_update, 'updated': len(moved), 'results': results},
+            status=status.HTTP_200_OK,
+        )
+
 class CompletedOrderListView(APIView):
     permission_classes = [IsAuthenticated,IsEmployee]
 
     def get(self, request, format=None):
-        completed_orders = Order.objects.filter(status='completed')
-        serializer = PendingOrderSerializer(completed_orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        completed_orders = (
+            Order.objects.filter(status='completed')
+            .select_related('address')
+            .prefetch_related('items__dish')
+        )
+        paginator = IdCursorPagination()
+        page = paginator.paginate_queryset(completed_orders, request, view=self)
+        serializer = PendingOrderSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
+def ranking_window(request):
+    """The optional ``?days=`` window of the top-dishes views; raises ValidationError if invalid."""
+    days = request.query_params.get('days')
+    if days is None:
+        return None
+    if not days.isdigit() or int(days) < 1:
+        raise ValidationError({'error': 'days must be a positive integer.'})
+    return int(days)
+
 class TopOrderedDishesView(APIView):
     def get(self, request):
-        top_dishes = (
-            OrderItem.objects
-            .values('dish__id', 'dish__name', 'dish__price')
-            .annotate(order_count=Count('id'))
-            .order_by('-order_count')[:5]
-        )
-        dish_ids = [dish['dish__id'] for dish in top_dishes]
-        detailed_dishes = Dish.objects.filter(id__in=dish_ids)
-        serializer = DishSerializer(detailed_dishes, many=True, context={'request': request})
+        top_dishes = ranking.top_dishes(days=ranking_window(request))
+        serializer = DishSerializer(top_dishes, many=True, context={'request': request})
         return Response({
             'top_dishes': serializer.data
         }, status=status.HTTP_200_OK)
@@ -311,7 +636,9 @@ class RateAPIView(APIView):
             # Check if the user has already rated this dish
             if Review.objects.filter(user=request.user, dish=dish).exists():
                 raise ValidationError("You have already rated this dish.")
-            serializer.save(user=request.user, dish=dish)
+            with transaction.atomic():
+                review = serializer.save(user=request.user, dish=dish)
+                dish.update_rating_stats(review.rating, count_delta=1)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -328,9 +655,47 @@ class RateAPIView(APIView):
 
             serializer = RateSerializer(review, data=request.data, partial=True)
             if serializer.is_valid():
-                serializer.save()
+                previous_rating = review.rating
+                with transaction.atomic():
+                    review = serializer.save()
+                    dish.update_rating_stats(review.rating - previous_rating)
                 return Response(serializer.data, status=status.HTTP_200_OK)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+
+class RateBatchAPIView(APIView):
+    """
+    The current user's ratings for many dishes in one request.
+
+    Accepts ``?dish_ids=1,2,3`` or ``?category=<name>`` and returns
+    ``{dish_id: user_rating}``. Requested dishes the user hasn't rated map
+    to 0; with ``category`` only rated dishes are listed.
+    """
+    permission_classes = [IsAuthenticated]
+    max_dish_ids = 500
+
+    def get(self, request, *args, **kwargs):
+        dish_ids_param = request.query_params.get('dish_ids', '')
+        category_name = request.query_params.get('category')
+
+        if dish_ids_param:
+            try:
+                dish_ids = {int(dish_id) for dish_id in dish_ids_param.split(',') if dish_id.strip()}
+            except ValueError:
+                return Response({"error": "dish_ids must be a comma-separated list of integers."}, status=status.HTTP_400_BAD_REQUEST)
+            if len(dish_ids) > self.max_dish_ids:
+                return Response({"error": f"At most {self.max_dish_ids} dish ids can be requested at once."}, status=status.HTTP_400_BAD_REQUEST)
+            ratings = dict.fromkeys(dish_ids, 0)
+            reviews = Review.objects.filter(user=request.user, dish_id__in=dish_ids)
+        elif category_name:
+            ratings = {}
+            reviews = Review.objects.filter(user=request.user, dish__category__name=category_name)
+        else:
+            return Response({"error": "Provide dish_ids or category."}, status=status.HTTP_400_BAD_REQUEST)
+
+        ratings.update(reviews.values_list('dish_id', 'rating'))
+        return Response(ratings, status=status.HTTP_200_OK)
         
         
 class AddressListCreateView(APIView):
@@ -359,18 +724,12 @@ class DiscountCodeListCreateView(ListCreateAPIView):
 
     def get(self, request, *args, **kwargs):
         """
-        List all discount codes for the manager and mark expired codes as inactive.
+        List all discount codes for the manager. Expired codes are shown as
+        inactive; the sweep command deactivates them in the database.
         """
         # Fetch all discount codes
         discount_codes = self.queryset.all()
 
-        # Check expiration for each discount code
-        for code in discount_codes:
-            # Check if the expiration date has passed and set is_active to False
-            if code.expiration_date <= timezone.now() and code.is_active:
-                code.is_active = False
-                code.save()
-
         # Serialize the list of discount codes
         serializer = self.serializer_class(discount_codes, many=True)
 
@@ -461,51 +820,40 @@ class ApplyDiscountCodeView(APIView):
             logger.error("Serializer validation failed. Errors: %s", serializer.errors)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-class PendingOrdersAPIView(APIView):
+class OrderHistoryAPIView(APIView):
     """
-    API to fetch pending orders for the authenticated user.
+    The authenticated user's orders, newest first and cursor paginated.
+
+    Filter with ``?status=pending`` or a comma-separated list such as
+    ``?status=completed,canceled``; all statuses are returned by default.
     """
     permission_classes = [IsAuthenticated]
+    valid_statuses = [choice for choice, _ in Order._meta.get_field('status').choices]
 
     def get(self, request):
-        user = request.user
-        logger.debug(f"Fetching pending orders for user: {user.username} (ID: {user.id})")
-
-        try:
-            # Fetch pending orders
-            pending_orders = Order.objects.filter(user=user, status='pending').order_by('-created_at')
-            data = []
-            for order in pending_orders:
-                # Retrieve items for each order
-                order_items = OrderItem.objects.filter(order=order).select_related('dish')
-                items_data = [
-                    {
-                        'dish_name': item.dish.name,
-                        'quantity': item.quantity,
-                    }
-                    for item in order_items
-                ]
-
-                # Append order data
-                data.append({
-                    'id': order.id,
-                    'address': str(order.address),
-                    'total_price': float(order.total_price),
-                    'created_at': order.created_at,
-                    'pending_at': order.created_at,  # Include pending timestamp
-                    'status': order.status,
-                    'items': items_data,
-                })
-
-            return Response(data, status=status.HTTP_200_OK)
-
-        except Exception as e:
-            logger.error(f"Error fetching pending orders for user {user.username}: {str(e)}")
+        status_param = request.query_params.get('status', '')
+        statuses = [value.strip() for value in status_param.split(',') if value.strip()]
+        invalid = [value for value in statuses if value not in self.valid_statuses]
+        if invalid:
             return Response(
-                {"error": "An error occurred while fetching pending orders."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {"error": f"Invalid status: {', '.join(invalid)}. Choose from {', '.join(self.valid_statuses)}."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
+        filters = {'user': request.user}
+        if statuses:
+            filters['status__in'] = statuses
+        # Old orders live in the archive; page through both stores together.
+        orders = [
+            queryset.select_related('address').prefetch_related('items__dish')
+            for queryset in order_querysets(**filters)
+        ]
+
+        paginator = MergedIdCursorPagination()
+        page = paginator.paginate_querysets(orders, request)
+        serializer = OrderHistorySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
 
 class CancelOrderAPIView(APIView):
     """
@@ -539,86 +887,24 @@ class CancelOrderAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Update the order status to 'canceled' (if not already canceled)
-        if order.status != 'canceled':
-            order.status = 'canceled'
-            order.save()
+        # Cancel only if the order is still pending; someone may have completed it meanwhile
+        if Order.objects.filter(id=order.id, user=user).transition(Order.CANCELED):
             logger.info(f"Order ID {order_id} canceled successfully by user {user.username}")
             return Response({"message": "Order canceled successfully"}, status=status.HTTP_200_OK)
 
-        logger.warning(f"Order ID {order_id} is already canceled")
-        return Response({"error": "Order is already canceled"}, status=status.HTTP_400_BAD_REQUEST)
+        logger.warning(f"Order ID {order_id} changed status before it could be canceled")
+        return order_transition_failed(Order.objects.filter(id=order.id))
     
-class CompletedOrdersAPIView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def get(self, request):
-        user = request.user
-        logger.debug(f"Fetching pending orders for user: {user.username} (ID: {user.id})")
-
-        try:
-            # Fetch pending orders
-            pending_orders = Order.objects.filter(user=user, status='completed').order_by('-created_at')
-            data = []
-            for order in pending_orders:
-                # Retrieve items for each order
-                order_items = OrderItem.objects.filter(order=order).select_related('dish')
-                items_data = [
-                    {
-                        'dish_name': item.dish.name,
-                        'quantity': item.quantity,
-                    }
-                    for item in order_items
-                ]
-
-                # Append order data
-                data.append({
-                    'id': order.id,
-                    'address': str(order.address),
-                    'total_price': float(order.total_price),
-                    'created_at': order.created_at,
-                    'pending_at': order.created_at,  # Include pending timestamp
-                    'status': order.status,
-                    'items': items_data,
-                })
-
-            return Response(data, status=status.HTTP_200_OK)
-
-        except Exception as e:
-            logger.error(f"Error fetching pending orders for user {user.username}: {str(e)}")
-            return Response(
-                {"error": "An error occurred while fetching pending orders."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-
 class TopOrderedDishesManagerView(APIView):
     permission_classes = [IsAuthenticated, IsManager]
 
     def get(self, request):
-        # Get the top 5 ordered dishes with order count
-        top_dishes = (
-            OrderItem.objects
-            .values('dish__id', 'dish__name', 'dish__price')
-            .annotate(order_count=Count('id'))
-            .order_by('-order_count')[:5]
-        )
-
-        # Get the detailed dish objects using the IDs
-        dish_ids = [dish['dish__id'] for dish in top_dishes]
-        detailed_dishes = Dish.objects.filter(id__in=dish_ids)
-
-        # Prepare a list of dishes with order count
-        top_dishes_with_count = []
-        for dish in detailed_dishes:
-            # Find the corresponding order_count from the query
-            order_count = next(
-                (item['order_count'] for item in top_dishes if item['dish__id'] == dish.id), 
-                0
-            )
-            # Serialize the dish and add order count
-            serialized_dish = DishSerializer(dish, context={'request': request}).data
-            serialized_dish['order_count'] = order_count
-            top_dishes_with_count.append(serialized_dish)
+        # Get the top 5 ordered dishes, with how much of each was ordered
+        top_dishes = ranking.top_dishes(days=ranking_window(request))
+        top_dishes_with_count = DishSerializer(top_dishes, many=True, context={'request': request}).data
+        for dish, serialized_dish in zip(top_dishes, top_dishes_with_count):
+            serialized_dish['order_count'] = dish.order_count
+            serialized_dish['ordered_quantity'] = dish.ordered_quantity
 
         return Response({
             'top_dishes': top_dishes_with_count
@@ -630,30 +916,159 @@ class OrdersInDateRangeView(APIView):
     permission_classes = [IsAuthenticated, IsManager]  # Ensure only managers can access this view
 
     def get(self, request):
-        start_date_str = request.query_params.get('start_date')
-        end_date_str = request.query_params.get('end_date')
-
+        # Half-open range of local days: end_date itself is not included.
         try:
-            # Parse the date strings to datetime objects
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+            start, end = reports.parse_date_range(
+                request.query_params.get('start_date'), request.query_params.get('end_date')
+            )
+        except ValueError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Order items in the date range, from both live and archived orders.
+        # Canceled orders are left out, as they are in the rollup below.
+        item_stores = item_querysets(
+            order__created_at__gte=start,
+            order__created_at__lt=end,
+            order__status__in=rollup.COUNTED_STATUSES,
+        )
 
-            # Filter orders based on the date range
-            orders = Order.objects.filter(created_at__gte=start_date, created_at__lte=end_date)
+        # Total revenue of the same days, from the daily sales rollup
+        total_revenue = DailyDishSales.objects.filter(
+            date__gte=timezone.localdate(start), date__lt=timezone.localdate(end)
+        ).aggregate(total=Sum('revenue'))['total'] or 0
 
-            # Calculate total revenue in the given date range by aggregating the price from related Dish model
-            total_revenue = OrderItem.objects.filter(order__in=orders).annotate(
-                dish_price=F('dish__price')  # Accessing price from the related Dish model
-            ).aggregate(total=Sum('dish_price'))['total'] or 0
+        # Serialize the order items (details such as dish name, price, quantity, etc.)
+        order_items = [item for items in item_stores for item in items.select_related('dish')]
+        order_item_serializer = OrderItemSerializer(order_items, many=True)
 
-            # Serialize the order items (details such as dish name, price, quantity, etc.)
-            order_items = OrderItem.objects.filter(order__in=orders)
-            order_item_serializer = OrderItemSerializer(order_items, many=True)
+        return Response({
+            'orders': order_item_serializer.data,
+            'total_revenue': total_revenue
+        }, status=status.HTTP_200_OK)
 
-            return Response({
-                'orders': order_item_serializer.data,
-                'total_revenue': total_revenue
-            }, status=status.HTTP_200_OK)
-        
-        except ValueError:
-            return Response({'error': 'Invalid date format. Please use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+
+class DashboardReportView(APIView):
+    """
+    Manager dashboard reports computed in memory by ``main.analytics``.
+
+    ``?start=`` and ``?end=`` (both or neither) limit a report to a
+    half-open range of local dates; by default it covers all orders.
+    """
+    permission_classes = [IsAuthenticated, IsManager]
+    report = None  # Name of the SalesAnalytics method, set per URL
+    trend_intervals = ['day', 'week', 'month']
+
+    def get(self, request):
+        start = end = None
+        if 'start' in request.query_params or 'end' in request.query_params:
+            try:
+                start, end = reports.parse_date_range(request.query_params.get('start'), request.query_params.get('end'))
+            except ValueError as error:
+                return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        options = {}
+        if self.report == 'category_trends':
+            options['interval'] = request.query_params.get('interval', 'day')
+            if options['interval'] not in self.trend_intervals:
+                return Response(
+                    {'error': f"Invalid interval. Choose from {', '.join(self.trend_intervals)}."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        if self.report == 'revenue_percentiles' and request.query_params.get('percentiles'):
+            try:
+                options['percentiles'] = [float(value) for value in request.query_params['percentiles'].split(',')]
+            except ValueError:
+                options['percentiles'] = None
+            if not options['percentiles'] or not all(0 <= value <= 100 for value in options['percentiles']):
+                return Response(
+                    {'error': 'percentiles must be a comma-separated list of numbers between 0 and 100.'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        results = getattr(analytics.engine, self.report)(start, end, **options)
+        return Response({
+            'start': start,
+            'end': end,
+            'timezone': settings.TIME_ZONE,
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+
+class SalesAnalyticsView(APIView):
+    """
+    Orders, quantity and revenue per time bucket, computed in the database.
+
+    ``?start=2024-01-01&end=2024-02-01`` is a half-open range of local dates
+    (``TIME_ZONE``); ``interval`` is hour, day (default), week or month and
+    ``group_by`` optionally splits each bucket by category or dish.
+    """
+    permission_classes = [IsAuthenticated, IsManager]
+
+    def get(self, request):
+        interval = request.query_params.get('interval', 'day')
+        group_by = request.query_params.get('group_by') or None
+        if interval not in reports.INTERVALS:
+            return Response(
+                {'error': f"Invalid interval. Choose from {', '.join(reports.INTERVALS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if group_by is not None and group_by not in reports.GROUPS:
+            return Response(
+                {'error': f"Invalid group_by. Choose from {', '.join(reports.GROUPS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            start, end = reports.parse_date_range(request.query_params.get('start'), request.query_params.get('end'))
+        except ValueError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        if interval == 'hour' and end - start > reports.MAX_HOURLY_RANGE:
+            return Response(
+                {'error': f'Hourly buckets are limited to {reports.MAX_HOURLY_RANGE.days} days.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response({
+            'start': start,
+            'end': end,
+            'timezone': settings.TIME_ZONE,
+            'interval': interval,
+            'group_by': group_by,
+            'totals': reports.sales_totals(start, end),
+            'buckets': reports.sales_buckets(start, end, interval, group_by),
+        }, status=status.HTTP_200_OK)
+
+
+async def order_export(request):
+    """
+    Stream every order item of ``?start=...&end=...`` (a half-open range of
+    local dates, as in the analytics API) as CSV, or as NDJSON with
+    ``?output=ndjson``. Managers only. Memory use stays flat however long
+    the range is, under WSGI and ASGI alike.
+    """
+    user = await token_user(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+    if user.role != CustomUser.MANAGER:
+        return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=status.HTTP_403_FORBIDDEN)
+
+    output = request.GET.get('output', 'csv')
+    if output not in exports.ENCODERS:
+        return JsonResponse(
+            {'error': f"Invalid output. Choose from {', '.join(exports.ENCODERS)}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        start, end = reports.parse_date_range(request.GET.get('start'), request.GET.get('end'))
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+    lines = exports.ENCODERS[output](exports.export_rows(start, end))
+    if isinstance(request, ASGIRequest):
+        # An ASGI server would read a sync generator to the end before
+        # sending it; a WSGI server streams it as it is.
+        lines = exports.in_worker_thread(lines)
+    response = StreamingHttpResponse(lines, content_type=exports.CONTENT_TYPES[output])
+    response['Content-Disposition'] = f'attachment; filename="orders-{start:%Y-%m-%d}-{end:%Y-%m-%d}.{output}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Dish,Category,CustomUser,Order,OrderItem,Review,Address,DiscountCode
+from .models import Dish,Category,CustomUser,Order,OrderItem,Review,Address,DiscountCode,ArchivedOrder,ArchivedOrderItem
 from django.contrib.auth.admin import UserAdmin
 
 @admin.register(Dish)
@@ -62,12 +62,24 @@ class OrderAdmin(admin.ModelAdmin):
     inlines = [OrderItemInline]  # نمایش آیتم‌های سفارش در جزئیات
 
     def mark_as_completed(modeladmin, request, queryset):
-        queryset.update(status='Completed')
+        queryset.transition(Order.COMPLETED)
     mark_as_completed.short_description = "Mark selected orders as completed"
 
     actions = [mark_as_completed]  # افزودن دکمه تایید یا لغو سفارش در پنل مدیریت
     
     
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'address', 'total_price', 'status', 'created_at', 'archived_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['user__username']
+    inlines = [ArchivedOrderItemInline]
+
+
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ('user', 'dish', 'rating', 'created_at')  # Columns to display in the admin list view
     list_filter = ('rating', 'created_at')  # Filter reviews by rating and created_at
@@ -0,0 +1,258 @@
+"""
+In-memory columnar copy of orders and order items for the manager
+dashboard, with reports computed by vectorized NumPy operations.
+
+Each server process keeps one ``SalesAnalytics`` instance (``engine``).
+Its first use loads every live and archived order; every later
+``snapshot()`` only reads orders and items with ids above the last ones
+seen, plus the current status of orders that were still pending, since
+those are the only orders whose status can change. Items are kept in id
+order, which matches commit order on SQLite; on a database that can commit
+ids out of order, a late row with a lower id would be missed until the
+process restarts.
+
+Times are stored twice as int64 seconds: ``created_at`` (UTC, for range
+filters) and ``local_time`` (wall clock in ``TIME_ZONE``, for hour, weekday
+and calendar buckets). Money is stored as int64 cents.
+"""
+import threading
+
+import numpy as np
+from django.utils import timezone
+
+from .archive import item_querysets, order_querysets
+from .models import Category, Order, OrderItem
+
+STATUS_CODES = {Order.PENDING: 0, Order.COMPLETED: 1, Order.CANCELED: 2}
+PENDING = STATUS_CODES[Order.PENDING]
+CANCELED = STATUS_CODES[Order.CANCELED]
+
+CHUNK_SIZE = 10000
+SECONDS_PER_DAY = 86400
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+DEFAULT_PERCENTILES = [50, 75, 90, 95, 99]
+
+
+def to_epoch(value):
+    return int(value.timestamp())
+
+
+def to_local_epoch(value):
+    local = timezone.localtime(value)
+    return int(local.timestamp()) + int(local.utcoffset().total_seconds())
+
+
+def to_cents(value):
+    return int(round(value * 100))
+
+
+def read_orders(querysets):
+    ids, created_at, local_time, status = [], [], [], []
+    for queryset in querysets:
+        for order_id, created, order_status in (
+            queryset.order_by('id').values_list('id', 'created_at', 'status').iterator(chunk_size=CHUNK_SIZE)
+        ):
+            ids.append(order_id)
+            created_at.append(to_epoch(created))
+            local_time.append(to_local_epoch(created))
+            status.append(STATUS_CODES[order_status])
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'created_at': np.array(created_at, dtype=np.int64),
+        'local_time': np.array(local_time, dtype=np.int64),
+        'status': np.array(status, dtype=np.int8),
+    }
+
+
+def read_items(querysets):
+    ids, order_ids, dish_ids, category_ids, quantities, line_totals = [], [], [], [], [], []
+    for queryset in querysets:
+        for item_id, order_id, dish_id, category_id, quantity, line_total in (
+            queryset.order_by('id')
+            .values_list('id', 'order_id', 'dish_id', 'dish__category_id', 'quantity', 'line_total')
+            .iterator(chunk_size=CHUNK_SIZE)
+        ):
+            ids.append(item_id)
+            order_ids.append(order_id)
+            dish_ids.append(dish_id)
+            category_ids.append(category_id)
+            quantities.append(quantity)
+            line_totals.append(to_cents(line_total))
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'order_id': np.array(order_ids, dtype=np.int64),
+        'dish_id': np.array(dish_ids, dtype=np.int32),
+        'category_id': np.array(category_ids, dtype=np.int32),
+        'quantity': np.array(quantities, dtype=np.int32),
+        'line_total': np.array(line_totals, dtype=np.int64),
+    }
+
+
+def sort_columns(columns):
+    order = np.argsort(columns['id'], kind='stable')
+    return {name: values[order] for name, values in columns.items()}
+
+
+def append_columns(columns, new):
+    return {name: np.concatenate([values, new[name]]) for name, values in columns.items()}
+
+
+def index_items(items, orders):
+    """Add each item's position in the (id sorted) order arrays."""
+    items['order_index'] = np.searchsorted(orders['id'], items['order_id'])
+    return items
+
+
+def order_totals(orders, items):
+    """Quantity and revenue (cents) per order, aligned with the order arrays."""
+    size = len(orders['id'])
+    quantity = np.bincount(items['order_index'], weights=items['quantity'], minlength=size)
+    revenue = np.bincount(items['order_index'], weights=items['line_total'], minlength=size)
+    return quantity.astype(np.int64), revenue.astype(np.int64)
+
+
+def order_mask(orders, start=None, end=None):
+    """Orders that weren't canceled and were created in ``[start, end)``."""
+    mask = orders['status'] != CANCELED
+    if start is not None:
+        mask &= orders['created_at'] >= to_epoch(start)
+    if end is not None:
+        mask &= orders['created_at'] < to_epoch(end)
+    return mask
+
+
+class SalesAnalytics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+
+    def snapshot(self):
+        """
+        Bring the arrays up to date with the database and return matching
+        ``(orders, items)`` column dicts. Later refreshes replace them rather
+        than growing them in place, so a snapshot stays consistent.
+        """
+        with self._lock:
+            if self._data is None:
+                self._data = self._load()
+            else:
+                self._data = self._load_new(*self._data)
+            return self._data
+
+    def _load(self):
+        # Items before orders: an item's order committed with it, so it is
+        # always found by the order read that follows.
+        items = sort_columns(read_items(item_querysets()))
+        orders = sort_columns(read_orders(order_querysets()))
+        return orders, index_items(items, orders)
+
+    def _load_new(self, orders, items):
+        last_item_id = int(items['id'][-1]) if len(items['id']) else 0
+        last_order_id = int(orders['id'][-1]) if len(orders['id']) else 0
+        # New rows are never archived yet, so only the live tables are read.
+        new_items = read_items([OrderItem.objects.filter(id__gt=last_item_id)])
+        new_orders = read_orders([Order.objects.filter(id__gt=last_order_id)])
+        orders = append_columns(orders, new_orders)
+        self._update_pending(orders)
+        return orders, append_columns(items, index_items(new_items, orders))
+
+    def _update_pending(self, orders):
+        pending = np.flatnonzero(orders['status'] == PENDING)
+        if not len(pending):
+            return
+        current = dict(
+            Order.objects.filter(id__in=orders['id'][pending].tolist())
+            .exclude(status=Order.PENDING)
+            .values_list('id', 'status')
+        )
+        if current:
+            changed = np.searchsorted(orders['id'], np.fromiter(current, dtype=np.int64))
+            orders['status'][changed] = [STATUS_CODES[status] for status in current.values()]
+
+    # Reports
+
+    def heatmap(self, start=None, end=None):
+        """Orders and revenue per weekday (Monday first) and local hour of day."""
+        orders, items = self.snapshot()
+        mask = order_mask(orders, start, end)
+        _, revenue = order_totals(orders, items)
+        local_time = orders['local_time'][mask]
+        hours = (local_time // 3600) % 24
+        # 1970-01-01 was a Thursday.
+        weekdays = (local_time // SECONDS_PER_DAY + 3) % 7
+        cells = weekdays * 24 + hours
+        order_counts = np.bincount(cells, minlength=7 * 24).reshape(7, 24)
+        cents = np.bincount(cells, weights=revenue[mask], minlength=7 * 24).reshape(7, 24)
+        return {
+            'weekdays': WEEKDAYS,
+            'hours': list(range(24)),
+            'orders': order_counts.tolist(),
+            'revenue': (cents / 100).round(2).tolist(),
+        }
+
+    def basket_sizes(self, start=None, end=None):
+        """How many orders had each number of items (by quantity)."""
+        orders, items = self.snapshot()
+        mask = order_mask(orders, start, end)
+        quantity, _ = order_totals(orders, items)
+        sizes = quantity[mask]
+        sizes = sizes[sizes > 0]
+        if not len(sizes):
+            return {'orders': 0, 'mean': None, 'median': None, 'distribution': []}
+        counts = np.bincount(sizes)
+        present = np.flatnonzero(counts)
+        return {
+            'orders': int(len(sizes)),
+            'mean': round(float(sizes.mean()), 2),
+            'median': float(np.median(sizes)),
+            'distribution': [{'items': int(size), 'orders': int(counts[size])} for size in present],
+        }
+
+    def revenue_percentiles(self, start=None, end=None, percentiles=DEFAULT_PERCENTILES):
+        """Percentiles of the order total."""
+        orders, items = self.snapshot()
+        mask = order_mask(orders, start, end)
+        _, revenue = order_totals(orders, items)
+        totals = revenue[mask] / 100
+        if not len(totals):
+            return {'orders': 0, 'mean': None, 'percentiles': {}}
+        values = np.percentile(totals, percentiles)
+        return {
+            'orders': int(len(totals)),
+            'mean': round(float(totals.mean()), 2),
+            'percentiles': {f'{p:g}': round(float(value), 2) for p, value in zip(percentiles, values)},
+        }
+
+    def category_trends(self, start=None, end=None, interval='day'):
+        """Quantity and revenue per category per local ``day``, ``week`` or ``month``."""
+        orders, items = self.snapshot()
+        item_mask = order_mask(orders, start, end)[items['order_index']]
+        days = orders['local_time'][items['order_index'][item_mask]] // SECONDS_PER_DAY
+        if interval == 'week':
+            # Back to Monday; 1970-01-01 was a Thursday.
+            days -= (days + 3) % 7
+        elif interval == 'month':
+            days = days.astype('datetime64[D]').astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+
+        categories = items['category_id'][item_mask].astype(np.int64)
+        # One integer key per (bucket, category) pair
+        width = int(categories.max()) + 1 if len(categories) else 1
+        keys, inverse = np.unique(days * width + categories, return_inverse=True)
+        quantity = np.bincount(inverse, weights=items['quantity'][item_mask], minlength=len(keys))
+        cents = np.bincount(inverse, weights=items['line_total'][item_mask], minlength=len(keys))
+
+        names = dict(Category.objects.filter(id__in=np.unique(categories).tolist()).values_list('id', 'name'))
+        return [
+            {
+                'start': str(np.datetime64(key // width, 'D')),
+                'category_id': key % width,
+                'category_name': names.get(key % width),
+                'quantity': int(quantity[index]),
+                'revenue': round(float(cents[index]) / 100, 2),
+            }
+            for index, key in enumerate(keys.tolist())
+        ]
+
+
+engine = SalesAnalytics()
@@ -0,0 +1,72 @@
+"""
+Cold storage for old orders.
+
+Completed and canceled orders older than ``ORDER_ARCHIVE_AFTER`` are moved,
+with their items, from ``Order``/``OrderItem`` into ``ArchivedOrder``/
+``ArchivedOrderItem``. Each batch is copied and deleted in its own
+transaction, so an interrupted run leaves every order in exactly one store
+and can simply be started again.
+
+Kitchen and customer endpoints that only care about recent or pending
+orders keep reading the small live tables. History and reporting use
+``order_querysets``/``item_querysets`` to read both stores.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+ORDER_FIELDS = ['id', 'user_id', 'status', 'created_at', 'address_id', 'confirmed', 'total_price', 'pending_at']
+ITEM_FIELDS = ['id', 'order_id', 'dish_id', 'quantity', 'unit_price', 'line_total']
+
+
+def archivable_orders(cutoff):
+    return Order.objects.filter(status__in=[Order.COMPLETED, Order.CANCELED], created_at__lt=cutoff)
+
+
+def archive_batch(cutoff, batch_size):
+    """Move up to ``batch_size`` orders created before ``cutoff``; returns (orders, items) moved."""
+    with transaction.atomic():
+        order_ids = list(
+            archivable_orders(cutoff).select_for_update()
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0, 0
+
+        orders = Order.objects.filter(id__in=order_ids).values(*ORDER_FIELDS)
+        items = OrderItem.objects.filter(order_id__in=order_ids).values(*ITEM_FIELDS)
+        ArchivedOrder.objects.bulk_create([ArchivedOrder(**row) for row in orders])
+        archived_items = ArchivedOrderItem.objects.bulk_create([ArchivedOrderItem(**row) for row in items])
+
+        OrderItem.objects.filter(order_id__in=order_ids).delete()
+        Order.objects.filter(id__in=order_ids).delete()
+    return len(order_ids), len(archived_items)
+
+
+def archive_orders(older_than=None, batch_size=500):
+    """
+    Archive every eligible order in batches; returns (orders, items) moved.
+
+    ``older_than`` is a timedelta and defaults to ``ORDER_ARCHIVE_AFTER``.
+    """
+    cutoff = timezone.now() - (older_than or settings.ORDER_ARCHIVE_AFTER)
+    total_orders = total_items = 0
+    while True:
+        orders, items = archive_batch(cutoff, batch_size)
+        if not orders:
+            return total_orders, total_items
+        total_orders += orders
+        total_items += items
+
+
+def order_querysets(**filters):
+    """The live and archived order querysets, with the same filters applied."""
+    return [Order.objects.filter(**filters), ArchivedOrder.objects.filter(**filters)]
+
+
+def item_querysets(**filters):
+    """The live and archived order item querysets, with the same filters applied."""
+    return [OrderItem.objects.filter(**filters), ArchivedOrderItem.objects.filter(**filters)]
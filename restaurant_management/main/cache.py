@@ -0,0 +1,47 @@
+import time
+
+from django.core.cache import cache
+
+MENU_VERSION_KEY = 'menu:version'
+SALES_VERSION_KEY = 'sales:version'
+
+
+def new_version():
+    """A fresh time based version; it never repeats a version still in use."""
+    return time.time_ns()
+
+
+def get_version(key):
+    """Return the current version stored under ``key``, seeding it if the cache lost it."""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    # A new value rather than incr(): the file cache increments with a
+    # separate get and set, so two processes bumping at once could both
+    # write the same number and one bump would be lost.
+    version = new_version()
+    cache.set(key, version, timeout=None)
+    return version
+
+
+def get_menu_version():
+    return get_version(MENU_VERSION_KEY)
+
+
+def bump_menu_version():
+    """Invalidate every cached menu by moving to a new version."""
+    return bump_version(MENU_VERSION_KEY)
+
+
+def get_sales_version():
+    return get_version(SALES_VERSION_KEY)
+
+
+def bump_sales_version():
+    """Invalidate cached sales rankings after orders were placed or canceled."""
+    return bump_version(SALES_VERSION_KEY)
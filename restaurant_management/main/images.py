@@ -0,0 +1,146 @@
+"""
+Resized WebP/JPEG derivatives of uploaded dish and category images.
+
+Derivatives are generated off the request path in a small thread pool once
+the upload's transaction commits. The result is stored on the instance's
+``image_variants`` field as::
+
+    {'source': 'dish_images/x.jpg',
+     'thumb': {'width': 160, 'webp': '.../x_thumb.webp', 'jpeg': '.../x_thumb.jpg'},
+     ...}
+
+``source`` records which upload the variants belong to, so a re-save with
+the same image doesn't regenerate them and a stale job can't overwrite
+variants of a newer upload.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+from .cache import bump_menu_version
+
+logger = logging.getLogger(__name__)
+
+# Target widths; images narrower than a target are not upscaled.
+VARIANT_WIDTHS = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1280,
+}
+
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Sent with the model and ``pk`` once new variants are stored.
+variants_saved = Signal()
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_DERIVATIVE_WORKERS,
+            thread_name_prefix='image-derivatives',
+        )
+    return _executor
+
+
+def derivative_name(name, variant, extension):
+    directory, filename = os.path.split(name)
+    stem, _ = os.path.splitext(filename)
+    return os.path.join(directory, 'derivatives', f'{stem}_{variant}.{extension}')
+
+
+def generate_derivatives(image_file):
+    """Write every variant of ``image_file`` to its storage and return the variants map."""
+    storage = image_file.storage
+    with storage.open(image_file.name, 'rb') as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+
+    variants = {'source': image_file.name}
+    for variant, target_width in VARIANT_WIDTHS.items():
+        resized = original.copy()
+        if resized.width > target_width:
+            height = round(resized.height * target_width / resized.width)
+            resized = resized.resize((target_width, height), Image.LANCZOS)
+
+        entry = {'width': resized.width}
+        for key, (pil_format, extension, options) in FORMATS.items():
+            frame = resized.convert('RGB') if pil_format == 'JPEG' else resized
+            buffer = BytesIO()
+            frame.save(buffer, pil_format, **options)
+            name = derivative_name(image_file.name, variant, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            entry[key] = storage.save(name, ContentFile(buffer.getvalue()))
+        variants[variant] = entry
+    return variants
+
+
+def process_image(model, pk, image_name):
+    try:
+        instance = model.objects.filter(pk=pk, image=image_name).first()
+        if instance is None:
+            return
+        variants = generate_derivatives(instance.image)
+        model.objects.filter(pk=pk, image=image_name).update(image_variants=variants)
+        bump_menu_version()
+        variants_saved.send(sender=model, pk=pk)
+    except Exception:
+        logger.exception("Failed to build image derivatives for %s #%s", model.__name__, pk)
+
+
+def _process_in_worker(model, pk, image_name):
+    # Worker threads get their own database connection; don't leak it.
+    close_old_connections()
+    try:
+        process_image(model, pk, image_name)
+    finally:
+        close_old_connections()
+
+
+def schedule_derivatives(instance):
+    """Queue derivative generation for ``instance`` if its image changed."""
+    image_name = instance.image.name if instance.image else ''
+    if not image_name or (instance.image_variants or {}).get('source') == image_name:
+        return
+
+    def submit():
+        if settings.IMAGE_DERIVATIVE_WORKERS:
+            _get_executor().submit(_process_in_worker, type(instance), instance.pk, image_name)
+        else:
+            process_image(type(instance), instance.pk, image_name)
+
+    transaction.on_commit(submit)
+
+
+def variant_urls(image_variants, build_url):
+    """
+    Map each format to an HTML ``srcset`` string, e.g.
+    ``{'webp': '/media/.._thumb.webp 160w, ...', 'jpeg': ...}``.
+    """
+    if not image_variants:
+        return {}
+    srcset = {}
+    for key in FORMATS:
+        # Small originals give several variants the same width; list each once.
+        candidates = {}
+        for variant in VARIANT_WIDTHS:
+            entry = image_variants.get(variant)
+            if entry and key in entry:
+                candidates.setdefault(entry['width'], build_url(entry[key]))
+        if candidates:
+            srcset[key] = ', '.join(f'{url} {width}w' for width, url in candidates.items())
+    return srcset
@@ -0,0 +1,74 @@
+"""
+Periodic cleanup run by the ``sweep`` management command.
+
+Each task issues set-based writes in small batches, so none of them holds
+a long write lock and the request path no longer has to clean up after
+itself (expired discount codes used to be deactivated on read).
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .models import DiscountCode, IdempotencyKey, Order, UserDiscount
+
+
+def delete_in_batches(queryset, batch_size):
+    """Delete the rows of ``queryset`` one batch of primary keys at a time; returns the count."""
+    model = queryset.model
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return deleted
+            model.objects.filter(pk__in=pks).delete()
+        deleted += len(pks)
+
+
+def expire_discount_codes(batch_size=500):
+    # A single UPDATE touching only the few codes that just expired; no batching needed.
+    return DiscountCode.objects.expire()
+
+
+def cancel_stale_orders(batch_size=500):
+    """Cancel orders still pending after ``STALE_ORDER_AGE``; returns the count."""
+    cutoff = timezone.now() - settings.STALE_ORDER_AGE
+    canceled = 0
+    while True:
+        order_ids = list(
+            Order.objects.filter(status=Order.PENDING, created_at__lt=cutoff)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return canceled
+        # Orders completed since the read are skipped by the conditional UPDATE.
+        canceled += Order.objects.filter(id__in=order_ids).transition(Order.CANCELED)
+
+
+def prune_tokens(batch_size=500):
+    """Delete auth tokens issued more than ``AUTH_TOKEN_MAX_AGE`` ago; their users log in again."""
+    cutoff = timezone.now() - settings.AUTH_TOKEN_MAX_AGE
+    return delete_in_batches(Token.objects.filter(created__lt=cutoff), batch_size)
+
+
+def prune_user_discounts(batch_size=500):
+    """Delete usage counters of codes that expired more than ``USER_DISCOUNT_RETENTION`` ago."""
+    cutoff = timezone.now() - settings.USER_DISCOUNT_RETENTION
+    return delete_in_batches(UserDiscount.objects.filter(discount_code__expiration_date__lt=cutoff), batch_size)
+
+
+def prune_idempotency_keys(batch_size=500):
+    cutoff = timezone.now() - settings.IDEMPOTENCY_KEY_TTL
+    return delete_in_batches(IdempotencyKey.objects.filter(created_at__lt=cutoff), batch_size)
+
+
+# Task name -> function(batch_size) returning the number of rows affected.
+TASKS = {
+    'expire_discount_codes': expire_discount_codes,
+    'cancel_stale_orders': cancel_stale_orders,
+    'prune_tokens': prune_tokens,
+    'prune_user_discounts': prune_user_discounts,
+    'prune_idempotency_keys': prune_idempotency_keys,
+}
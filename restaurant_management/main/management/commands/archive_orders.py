@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from main.archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Move completed and canceled orders older than ORDER_ARCHIVE_AFTER (or --days) into the archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive orders created more than this many days ago.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        older_than = timedelta(days=options['days']) if options['days'] is not None else None
+        orders, items = archive_orders(older_than, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {orders} orders with {items} items.'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from main.cache import bump_menu_version
+from main.models import Dish, Review, dish_ratings_changed
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored rating sum, count and average of every dish from its reviews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        totals = {
+            row['dish_id']: row
+            for row in Review.objects.values('dish_id').annotate(total=Sum('rating'), count=Count('id'))
+        }
+
+        dishes = []
+        with transaction.atomic():
+            for dish in Dish.objects.only('id').iterator(chunk_size=options['batch_size']):
+                row = totals.get(dish.id)
+                dish.rating_sum = row['total'] if row else 0
+                dish.rating_count = row['count'] if row else 0
+                dish.average_rating = round(dish.rating_sum / dish.rating_count, 2) if dish.rating_count else 0
+                dishes.append(dish)
+            Dish.objects.bulk_update(
+                dishes,
+                ['rating_sum', 'rating_count', 'average_rating'],
+                batch_size=options['batch_size'],
+            )
+            # bulk_update() sends no signals, so cached menus are invalidated here.
+            transaction.on_commit(bump_menu_version)
+            dish_ratings_changed.send(sender=Dish, dish_ids=[dish.id for dish in dishes])
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating stats for {len(dishes)} dishes.'))
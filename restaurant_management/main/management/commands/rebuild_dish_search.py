@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from main import search
+
+
+class Command(BaseCommand):
+    help = 'Drop and rebuild the full-text dish search index.'
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            raise CommandError('Full-text dish search needs the SQLite database backend.')
+
+        with transaction.atomic():
+            count = search.rebuild_index()
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} dishes.'))
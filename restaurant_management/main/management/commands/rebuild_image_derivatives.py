@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from main.images import process_image
+from main.models import Category, Dish
+
+
+class Command(BaseCommand):
+    help = 'Regenerate resized WebP/JPEG variants for every dish and category image.'
+
+    def handle(self, *args, **options):
+        for model in (Category, Dish):
+            count = 0
+            for pk, image_name in model.objects.exclude(image='').values_list('pk', 'image').iterator():
+                process_image(model, pk, image_name)
+                count += 1
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {count} images processed.')
+        self.stdout.write(self.style.SUCCESS('Done.'))
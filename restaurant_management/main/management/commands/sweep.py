@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.maintenance import TASKS
+
+
+class Command(BaseCommand):
+    help = (
+        'Expire discount codes, cancel stale pending orders and prune old tokens, '
+        'discount usage and idempotency keys. Meant to be run periodically, e.g. from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tasks', nargs='*', metavar='task',
+            help=f'Tasks to run (default: all). Choices: {", ".join(TASKS)}.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        unknown = [name for name in options['tasks'] if name not in TASKS]
+        if unknown:
+            raise CommandError(f'Unknown task: {", ".join(unknown)}')
+
+        for name in options['tasks'] or TASKS:
+            started = time.monotonic()
+            count = TASKS[name](batch_size=options['batch_size'])
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'{name}: {count} rows in {elapsed:.2f}s')
+        self.stdout.write(self.style.SUCCESS('Sweep finished.'))
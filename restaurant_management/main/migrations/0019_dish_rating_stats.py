@@ -0,0 +1,42 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:46
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_stats(apps, schema_editor):
+    Dish = apps.get_model('main', 'Dish')
+    Review = apps.get_model('main', 'Review')
+    totals = Review.objects.values('dish_id').annotate(total=Sum('rating'), count=Count('id'))
+    for row in totals:
+        Dish.objects.filter(pk=row['dish_id']).update(
+            rating_sum=row['total'],
+            rating_count=row['count'],
+            average_rating=round(row['total'] / row['count'], 2),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_order_pending_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='average_rating',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_stats, migrations.RunPython.noop),
+    ]
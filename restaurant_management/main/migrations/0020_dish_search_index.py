@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:02
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS main_dish_fts USING fts5("
+        "name, description, category_name, "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    schema_editor.execute(
+        "INSERT INTO main_dish_fts (rowid, name, description, category_name) "
+        "SELECT d.id, d.name, COALESCE(d.description, ''), c.name "
+        "FROM main_dish d JOIN main_category c ON c.id = d.category_id"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS main_dish_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_dish_rating_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_sales(apps, schema_editor):
+    DailyDishSales = apps.get_model('main', 'DailyDishSales')
+    totals = {}
+    for model_name in ('OrderItem', 'ArchivedOrderItem'):
+        items = apps.get_model('main', model_name).objects.filter(order__status__in=['pending', 'completed'])
+        rows = (
+            items.annotate(date=TruncDate('order__created_at'))
+            .values('date', 'dish_id')
+            .annotate(
+                total_quantity=Sum('quantity'),
+                total_orders=Count('order_id', distinct=True),
+                total_revenue=Sum(F('quantity') * F('dish__price'), output_field=DecimalField()),
+            )
+        )
+        for row in rows:
+            entry = totals.setdefault((row['date'], row['dish_id']), [0, 0, 0])
+            entry[0] += row['total_quantity']
+            entry[1] += row['total_orders']
+            entry[2] += row['total_revenue']
+    DailyDishSales.objects.bulk_create(
+        [
+            DailyDishSales(date=date, dish_id=dish_id, quantity=quantity, order_count=order_count, revenue=revenue)
+            for (date, dish_id), (quantity, order_count, revenue) in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0025_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyDishSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('dish', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='main.dish')),
+            ],
+            options={
+                'unique_together': {('date', 'dish')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def backfill_item_prices(apps, schema_editor):
+    # History has no record of the price paid; the current dish price is the best estimate.
+    for model_name in ('OrderItem', 'ArchivedOrderItem'):
+        model = apps.get_model('main', model_name)
+        last_id = 0
+        while True:
+            items = list(
+                model.objects.filter(id__gt=last_id)
+                .select_related('dish')
+                .only('id', 'quantity', 'dish__price')
+                .order_by('id')[:BATCH_SIZE]
+            )
+            if not items:
+                break
+            for item in items:
+                item.unit_price = item.dish.price
+                item.line_total = item.dish.price * item.quantity
+            model.objects.bulk_update(items, ['unit_price', 'line_total'])
+            last_id = items[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0026_daily_dish_sales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_item_prices, migrations.RunPython.noop),
+    ]
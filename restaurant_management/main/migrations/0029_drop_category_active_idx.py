@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:41
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0028_archive_big_ids'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='category',
+            name='category_active_idx',
+        ),
+    ]
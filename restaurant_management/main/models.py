@@ -1,10 +1,14 @@
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.functions import Cast, Round
+from django.db.models.lookups import Exact
+from django.dispatch import Signal
 from django.contrib.auth.models import AbstractUser, Group, Permission
 import os
 import uuid
 from datetime import datetime
 from django.conf import settings
 from django.utils import timezone
+from .cache import bump_menu_version
 
 class CustomUser(AbstractUser):
     MANAGER = 'manager'
@@ -45,6 +49,7 @@ def category_image_upload_to(instance, filename):
 class Category(models.Model):
     name = models.CharField(max_length=125, blank=False, null=False, unique=True, db_index=True)
     image = models.ImageField(upload_to=category_image_upload_to, blank=False, null=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # See main.images
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
@@ -61,20 +66,45 @@ def dish_image_upload_to(instance, filename):
     unique_name = f"{instance.name}_{uuid.uuid4().hex}.{ext}"
     return os.path.join('dishes', today, unique_name)
 
+# Sent when the stored rating aggregates of dishes change, with ``dish_ids``.
+dish_ratings_changed = Signal()
+
 class Dish(models.Model):
     name = models.CharField(max_length=100, blank=False, null=False)
     description = models.TextField(blank=True, null=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='dishes')
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to='dish_images/')  # Corrected upload_to path
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # See main.images
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
-    
-    @property
-    def average_rating(self):
-        # This will calculate the average rating for the dish.
-        avg_rating = self.reviews.aggregate(avg_score=models.Avg('rating'))['avg_score']
-        return round(avg_rating or 0, 2)  # Ensure a default of 0 if no ratings
+    # Stored review aggregates, kept in step with Review writes so listing
+    # dishes never has to aggregate the reviews table per row.
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+
+    def update_rating_stats(self, rating_delta, count_delta=0):
+        """Apply a change in review totals and recompute the stored average.
+
+        One UPDATE: its expressions all read the row as it was, so the
+        average is computed from the new totals directly. The instance's
+        fields are not refreshed. Must be called inside the transaction
+        that writes the Review.
+        """
+        rating_sum = models.F('rating_sum') + rating_delta
+        rating_count = models.F('rating_count') + count_delta
+        Dish.objects.filter(pk=self.pk).update(
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            average_rating=models.Case(
+                models.When(Exact(rating_count, 0), then=models.Value(0)),
+                default=Round(Cast(rating_sum, models.FloatField()) / rating_count, 2),
+                output_field=models.DecimalField(max_digits=3, decimal_places=2),
+            ),
+        )
+        transaction.on_commit(bump_menu_version)
+        dish_ratings_changed.send(sender=Dish, dish_ids=[self.pk])
 
     def __str__(self):
         return self.name
@@ -85,22 +115,125 @@ class Address(models.Model):
 
     def __str__(self):
         return f"{self.street}, {self.area}"
+# Sent inside the transaction of every OrderQuerySet.transition() that
+# moved orders, with ``order_ids`` and the new ``status``.
+orders_transitioned = Signal()
+
+class OrderQuerySet(models.QuerySet):
+    def transition(self, to_status):
+        """
+        Move every matching order that may enter ``to_status`` into it with
+        one conditional UPDATE, writing only the status column.
+
+        Returns the number of orders changed; orders that had already moved
+        on are left alone, so concurrent transitions can't both succeed.
+        """
+        return len(self.transition_ids(to_status))
+
+    def transition_ids(self, to_status):
+        """
+        Like ``transition()`` but returns the ids of the orders moved.
+
+        The candidates are read first. A single order is moved with a plain
+        conditional ``update()``, whose row count says whether it moved.
+        Several orders are moved with ``UPDATE ... RETURNING`` where the
+        backend has it, or else with the candidates locked first.
+        """
+        sources = [source for source, targets in Order.TRANSITIONS.items() if to_status in targets]
+        if not sources:
+            return []
+        order_ids = list(self.filter(status__in=sources).values_list('id', flat=True))
+        if not order_ids:
+            return []
+
+        orders = Order.objects.using(self.db)
+        connection = connections[self.db]
+        with transaction.atomic(using=self.db):
+            if len(order_ids) == 1:
+                updated = orders.filter(id=order_ids[0], status__in=sources).update(status=to_status)
+                moved = order_ids if updated else []
+            elif update_returning_supported(connection):
+                moved = update_returning_ids(connection, order_ids, sources, to_status)
+            else:
+                moved = list(
+                    orders.select_for_update()
+                    .filter(id__in=order_ids, status__in=sources)
+                    .values_list('id', flat=True)
+                )
+                orders.filter(id__in=moved).update(status=to_status)
+            if moved:
+                orders_transitioned.send(sender=Order, order_ids=moved, status=to_status)
+        return moved
+
+
+def update_returning_supported(connection):
+    """Whether the backend can return the ids an UPDATE wrote."""
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return False
+
+
+def update_returning_ids(connection, order_ids, sources, to_status):
+    """Move ``order_ids`` still in ``sources`` to ``to_status``; returns the ids written."""
+    table = connection.ops.quote_name(Order._meta.db_table)
+    id_placeholders = ', '.join(['%s'] * len(order_ids))
+    status_placeholders = ', '.join(['%s'] * len(sources))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET status = %s "
+            f"WHERE id IN ({id_placeholders}) AND status IN ({status_placeholders}) RETURNING id",
+            [to_status, *order_ids, *sources],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
 class Order(models.Model):
+    PENDING = 'pending'
+    COMPLETED = 'completed'
+    CANCELED = 'canceled'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (COMPLETED, 'Completed'), (CANCELED, 'Canceled')]
+    # Allowed status changes; completed and canceled orders are final.
+    TRANSITIONS = {
+        PENDING: {COMPLETED, CANCELED},
+        COMPLETED: set(),
+        CANCELED: set(),
+    }
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
     status = models.CharField(
         max_length=50, 
-        choices=[('pending', 'Pending'), ('completed', 'Completed'), ('canceled', 'Canceled')],
-        default='pending'
+        choices=STATUS_CHOICES,
+        default=PENDING
     )
     created_at = models.DateTimeField(auto_now_add=True)
     address = models.ForeignKey(Address, on_delete=models.CASCADE , null=True, blank=False)  # Link to Address model
     confirmed = models.BooleanField(default=False)  # Order confirmation status
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     pending_at = models.DateTimeField(null=True, blank=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Kitchen and employee lists: one status, newest id first.
+            models.Index(fields=['status'], name='order_status_idx'),
+            # A customer's history filtered by status.
+            models.Index(fields=['user', 'status', 'created_at'], name='order_user_status_created_idx'),
+            # Date range reports and archiving.
+            models.Index(fields=['created_at'], name='order_created_idx'),
+            # Only the small pending set, by age, for the stale order sweep.
+            models.Index(
+                fields=['created_at'],
+                name='order_pending_created_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+
     @property
     def calculate_total_price(self):
         order_items = self.items.all()  # Correct: 'items' instead of 'orderitem_set'
-        total_price = sum(item.dish.price * item.quantity for item in order_items)
+        total_price = sum(item.line_total for item in order_items)
         return total_price
 
     def __str__(self):
@@ -110,10 +243,74 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     dish = models.ForeignKey('Dish', on_delete=models.CASCADE, related_name='order_items')
     quantity = models.PositiveIntegerField(default=1)
+    # The dish price when the order was placed, and unit_price * quantity
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    line_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            # Covers per-dish quantity totals (top dishes) without touching the table.
+            models.Index(fields=['dish', 'quantity'], name='orderitem_dish_quantity_idx'),
+        ]
 
     def __str__(self):
         return f"{self.quantity} x {self.dish.name} (Order #{self.order.id})"
 
+class DailyDishSales(models.Model):
+    """
+    Sales of one dish on one day (in ``TIME_ZONE``), counting orders that
+    weren't canceled. Kept up to date by ``main.rollup`` as orders are
+    placed and canceled, so reports don't aggregate raw order items.
+    """
+    date = models.DateField()
+    dish = models.ForeignKey('Dish', on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.PositiveIntegerField(default=0)
+    order_count = models.PositiveIntegerField(default=0)  # Orders containing the dish
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'dish')
+
+    def __str__(self):
+        return f"{self.date} - {self.dish.name}: {self.quantity}"
+
+class ArchivedOrder(models.Model):
+    """
+    A completed or canceled order moved out of ``Order`` by ``main.archive``.
+
+    It keeps the original order id, so ids never clash with live orders and
+    both stores can be read together in id order.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_orders')
+    status = models.CharField(max_length=50, choices=Order.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    address = models.ForeignKey(Address, on_delete=models.CASCADE, null=True)
+    confirmed = models.BooleanField(default=False)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    pending_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status', 'created_at'], name='archorder_user_status_idx'),
+            models.Index(fields=['created_at'], name='archorder_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order #{self.id} by {self.user.username} - {self.status}"
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    dish = models.ForeignKey('Dish', on_delete=models.CASCADE, related_name='archived_order_items')
+    quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    line_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.dish.name} (Archived order #{self.order_id})"
+
 class Review(models.Model):
     RATING_CHOICES = [(i, str(i)) for i in range(1, 6)]  # Ratings from 1 to 5
 
@@ -128,6 +325,11 @@ class Review(models.Model):
         return f"{self.user.username} - {self.dish.name} - {self.rating}"
     
     
+class DiscountCodeQuerySet(models.QuerySet):
+    def expire(self):
+        """Deactivate every active code past its expiration date in one UPDATE; returns the count."""
+        return self.filter(is_active=True, expiration_date__lte=timezone.now()).update(is_active=False)
+
 class DiscountCode(models.Model):
     code = models.CharField(max_length=50, unique=True)  # Unique discount code (e.g., "CHAMRAN1403")
     discount_percentage = models.PositiveIntegerField()  # Discount percentage (e.g., 20 for 20%)
@@ -136,12 +338,10 @@ class DiscountCode(models.Model):
     used_count = models.PositiveIntegerField(default=0)
     max_usage_per_user = models.PositiveIntegerField(default=1)  # Max usage per user
 
-    def is_valid(self):
-        """Check if the discount code is still valid."""
-        if self.expiration_date <= timezone.now():
-            self.is_active = False  # Automatically deactivate the code if expired
-            self.save()
+    objects = DiscountCodeQuerySet.as_manager()
 
+    def is_valid(self):
+        """Check if the discount code is still valid. Expired codes are deactivated by the sweep command."""
         return (
             self.is_active and 
             self.expiration_date > timezone.now()
@@ -167,4 +367,24 @@ class DiscountCode(models.Model):
 class UserDiscount(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)  # Associate with the user
     discount_code = models.ForeignKey(DiscountCode, on_delete=models.CASCADE)  # Associate with the discount code
-    usage_count = models.PositiveIntegerField(default=0)  # Number of times this user has used the code
\ No newline at end of file
+    usage_count = models.PositiveIntegerField(default=0)  # Number of times this user has used the code
+
+
+class IdempotencyKey(models.Model):
+    """
+    The stored outcome of a request sent with an ``Idempotency-Key`` header,
+    replayed when a client retries the same request. Rows older than
+    ``IDEMPOTENCY_KEY_TTL`` are ignored and pruned.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)  # sha256 of the request body
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"{self.user.username} - {self.key}"
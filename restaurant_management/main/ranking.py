@@ -0,0 +1,42 @@
+"""
+Best-selling dishes, ranked by ordered quantity.
+
+The ranking is one query: ``Dish`` annotated with its totals from the
+daily sales rollup, optionally over the last N days. Results are cached
+for ``TOP_DISHES_CACHE_TIMEOUT`` under the current menu and sales versions,
+so a new or canceled order, or a menu edit, invalidates them straight away.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .cache import get_menu_version, get_sales_version
+from .models import Dish
+
+
+def top_dishes(limit=5, days=None):
+    """
+    The ``limit`` dishes with the highest ordered quantity, best first, over
+    the last ``days`` days (today included) or all time.
+
+    Each dish carries ``ordered_quantity`` and ``order_count`` (orders that
+    contained it).
+    """
+    key = f'top-dishes:{get_menu_version()}:{get_sales_version()}:{limit}:{days}'
+    dishes = cache.get(key)
+    if dishes is None:
+        window = Q(daily_sales__date__gt=timezone.localdate() - timedelta(days=days)) if days else None
+        dishes = list(
+            Dish.objects.select_related('category')
+            .annotate(
+                ordered_quantity=Sum('daily_sales__quantity', filter=window),
+                order_count=Sum('daily_sales__order_count', filter=window),
+            )
+            .filter(ordered_quantity__gt=0)
+            .order_by('-ordered_quantity', 'id')[:limit]
+        )
+        cache.set(key, dishes, settings.TOP_DISHES_CACHE_TIMEOUT)
+    return dishes
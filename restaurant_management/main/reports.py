@@ -0,0 +1,114 @@
+"""
+Time-bucketed sales figures computed in the database.
+
+Buckets are truncated in the current time zone (``TIME_ZONE``), and ranges
+are half-open: ``start <= created_at < end``. Canceled orders are left out,
+as in the daily sales rollup. Live and archived orders are both counted.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .archive import item_querysets
+from .rollup import COUNTED_STATUSES
+
+INTERVALS = {
+    'hour': TruncHour,
+    'day': TruncDay,
+    'week': TruncWeek,  # Weeks start on Monday
+    'month': TruncMonth,
+}
+
+# group_by -> (id field, name field) of the order items
+GROUPS = {
+    'category': ('dish__category_id', 'dish__category__name'),
+    'dish': ('dish_id', 'dish__name'),
+}
+
+# Hourly buckets over longer ranges would return thousands of rows.
+MAX_HOURLY_RANGE = timedelta(days=31)
+
+
+def local_day_range(start_date, end_date):
+    """Aware datetimes for local midnight of ``start_date`` and ``end_date``, as a half-open range."""
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start_date, time.min), tz),
+        timezone.make_aware(datetime.combine(end_date, time.min), tz),
+    )
+
+
+def parse_date_range(start_value, end_value):
+    """
+    Turn ``YYYY-MM-DD`` start and end strings into a half-open range of aware
+    local datetimes; raises ValueError with a message for the client.
+    """
+    try:
+        start_date = datetime.strptime(start_value or '', '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_value or '', '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('start and end must be dates in YYYY-MM-DD format.')
+    if end_date <= start_date:
+        raise ValueError('end must be after start.')
+    return local_day_range(start_date, end_date)
+
+
+def counted_items(start, end):
+    return item_querysets(
+        order__created_at__gte=start,
+        order__created_at__lt=end,
+        order__status__in=COUNTED_STATUSES,
+    )
+
+
+def sales_buckets(start, end, interval, group_by=None):
+    """
+    Orders, quantity and revenue per ``interval`` bucket (and per category or
+    dish with ``group_by``) for orders created in ``[start, end)``.
+    """
+    keys = ['bucket', *GROUPS.get(group_by, ())]
+    truncate = INTERVALS[interval]('order__created_at', tzinfo=timezone.get_current_timezone())
+    buckets = {}
+    for items in counted_items(start, end):
+        rows = (
+            items.annotate(bucket=truncate)
+            .values(*keys)
+            .annotate(
+                total_orders=Count('order_id', distinct=True),
+                total_quantity=Sum('quantity'),
+                total_revenue=Sum('line_total'),
+            )
+            .order_by()
+        )
+        for row in rows:
+            key = tuple(row[name] for name in keys)
+            entry = buckets.setdefault(key, {'orders': 0, 'quantity': 0, 'revenue': Decimal('0.00')})
+            entry['orders'] += row['total_orders']
+            entry['quantity'] += row['total_quantity']
+            entry['revenue'] += row['total_revenue']
+
+    results = []
+    for key in sorted(buckets, key=lambda key: (key[0], str(key[1:]))):
+        result = {'start': key[0]}
+        if group_by:
+            result[f'{group_by}_id'], result[f'{group_by}_name'] = key[1:]
+        result.update(buckets[key])
+        results.append(result)
+    return results
+
+
+def sales_totals(start, end):
+    totals = {'orders': 0, 'quantity': 0, 'revenue': Decimal('0.00')}
+    for items in counted_items(start, end):
+        row = items.aggregate(
+            total_orders=Count('order_id', distinct=True),
+            total_quantity=Sum('quantity'),
+            total_revenue=Sum('line_total'),
+        )
+        totals['orders'] += row['total_orders']
+        totals['quantity'] += row['total_quantity'] or 0
+        totals['revenue'] += row['total_revenue'] or 0
+    return totals
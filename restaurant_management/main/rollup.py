@@ -0,0 +1,131 @@
+"""
+Incremental maintenance of the ``DailyDishSales`` rollup.
+
+Placing an order adds its items to the rollup and canceling it subtracts
+them again, in the same transaction as the order write. Revenue is the
+sum of the items' ``line_total``, i.e. the prices the customer paid.
+``rebuild`` recomputes the whole table from live and archived orders.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .archive import item_querysets
+from .cache import bump_sales_version
+from .models import DailyDishSales, Order, OrderItem
+
+# Orders in these statuses count as sales.
+COUNTED_STATUSES = [Order.PENDING, Order.COMPLETED]
+
+
+def order_totals(order_ids):
+    """Sum the items of ``order_ids`` per (local date, dish): {key: [quantity, order_count, revenue]}."""
+    totals = defaultdict(lambda: [0, 0, Decimal(0)])
+    rows = OrderItem.objects.filter(order_id__in=order_ids).values_list(
+        'order_id', 'order__created_at', 'dish_id'
+    ).annotate(quantity=Sum('quantity'), revenue=Sum('line_total'))
+    for _, created_at, dish_id, quantity, revenue in rows:
+        entry = totals[(timezone.localdate(created_at), dish_id)]
+        entry[0] += quantity
+        entry[1] += 1
+        entry[2] += revenue
+    return totals
+
+
+def apply_totals(totals, sign):
+    for (date, dish_id), (quantity, order_count, revenue) in totals.items():
+        changes = {
+            'quantity': F('quantity') + sign * quantity,
+            'order_count': F('order_count') + sign * order_count,
+            'revenue': F('revenue') + sign * revenue,
+        }
+        rows = DailyDishSales.objects.filter(date=date, dish_id=dish_id)
+        if rows.update(**changes) or sign < 0:
+            continue
+        try:
+            with transaction.atomic():
+                DailyDishSales.objects.create(
+                    date=date, dish_id=dish_id, quantity=quantity, order_count=order_count, revenue=revenue
+                )
+        except IntegrityError:
+            # Another order created the row first.
+            rows.update(**changes)
+
+
+def add_orders(order_ids):
+    with transaction.atomic():
+        apply_totals(order_totals(order_ids), 1)
+        transaction.on_commit(bump_sales_version)
+
+
+def remove_orders(order_ids):
+    with transaction.atomic():
+        apply_totals(order_totals(order_ids), -1)
+        transaction.on_commit(bump_sales_version)
+
+
+def aggregate_range(items, start_id, end_id):
+    """Per (date, dish) totals of ``items`` belonging to orders with start_id <= id < end_id."""
+    close_old_connections()
+    try:
+        return list(
+            items.filter(order_id__gte=start_id, order_id__lt=end_id, order__status__in=COUNTED_STATUSES)
+            .annotate(date=TruncDate('order__created_at'))
+            .values('date', 'dish_id')
+            .annotate(
+                total_quantity=Sum('quantity'),
+                total_orders=Count('order_id', distinct=True),
+                total_revenue=Sum('line_total'),
+            )
+        )
+    finally:
+        close_old_connections()
+
+
+def rebuild(batch_size=5000, workers=4):
+    """
+    Recompute the rollup from every live and archived order.
+
+    Orders are split into id ranges of ``batch_size`` that are aggregated in
+    the database by ``workers`` threads; the merged result replaces the table
+    in one transaction. Orders placed while it runs may be missed, so run it
+    when the restaurant is closed. Returns the number of rollup rows.
+    """
+    jobs = []
+    for items in item_querysets():
+        bounds = items.aggregate(low=Min('order_id'), high=Max('order_id'))
+        if bounds['low'] is None:
+            continue
+        for start_id in range(bounds['low'], bounds['high'] + 1, batch_size):
+            jobs.append((items, start_id, start_id + batch_size))
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sales-rollup') as executor:
+            results = list(executor.map(lambda job: aggregate_range(*job), jobs))
+    else:
+        results = [aggregate_range(*job) for job in jobs]
+
+    totals = defaultdict(lambda: [0, 0, Decimal(0)])
+    for rows in results:
+        for row in rows:
+            entry = totals[(row['date'], row['dish_id'])]
+            entry[0] += row['total_quantity']
+            entry[1] += row['total_orders']
+            entry[2] += row['total_revenue']
+
+    with transaction.atomic():
+        transaction.on_commit(bump_sales_version)
+        DailyDishSales.objects.all().delete()
+        DailyDishSales.objects.bulk_create(
+            [
+                DailyDishSales(date=date, dish_id=dish_id, quantity=quantity, order_count=order_count, revenue=revenue)
+                for (date, dish_id), (quantity, order_count, revenue) in totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totals)
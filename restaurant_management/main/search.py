@@ -0,0 +1,123 @@
+"""
+Full-text dish search backed by an SQLite FTS5 table.
+
+The table is keyed by dish id (its rowid) and holds the dish name,
+description and category name. Signals in ``main.signals`` keep it in
+step with Dish and Category writes; ``rebuild_dish_search`` recreates it
+from scratch. On any other database backend these helpers do nothing and
+callers should fall back to a plain ORM filter.
+"""
+from django.db import connection
+
+FTS_TABLE = 'main_dish_fts'
+
+# Column weights for bm25(): a hit in the name matters most, then the
+# category, then the description.
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 2.0
+CATEGORY_WEIGHT = 5.0
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def create_index_sql():
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "name, description, category_name, "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+
+
+def index_dish(dish):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [dish.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, category_name) VALUES (%s, %s, %s, %s)",
+            [dish.pk, dish.name, dish.description or '', dish.category.name],
+        )
+
+
+def remove_dish(dish_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [dish_id])
+
+
+def reindex_category(category):
+    """Refresh the category name stored against each of its dishes."""
+    if not fts_available():
+        return
+    dish_ids = list(category.dishes.values_list('id', flat=True))
+    if not dish_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(dish_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {FTS_TABLE} SET category_name = %s WHERE rowid IN ({placeholders})",
+            [category.name, *dish_ids],
+        )
+
+
+def rebuild_index():
+    """Drop and repopulate the index; returns the number of dishes indexed."""
+    from .models import Dish
+
+    if not fts_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        cursor.execute(create_index_sql())
+        rows = [
+            (dish['id'], dish['name'], dish['description'] or '', dish['category__name'])
+            for dish in Dish.objects.values('id', 'name', 'description', 'category__name').iterator()
+        ]
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, category_name) VALUES (%s, %s, %s, %s)",
+            rows,
+        )
+    return len(rows)
+
+
+def build_match_query(term):
+    """
+    Turn free text into an FTS5 query where every word must match as a prefix.
+
+    Each word is quoted so characters such as ``-`` or ``:`` can't be read as
+    FTS5 syntax.
+    """
+    words = [word.replace('"', '') for word in term.split()]
+    return ' '.join(f'"{word}"*' for word in words if word)
+
+
+def search_dish_ids(term, limit=50, category=None):
+    """
+    Return ids of dishes matching ``term``, best match first.
+
+    With ``category`` only dishes of that category (by name) are ranked,
+    so the filter is applied before the limit rather than after it.
+    """
+    match = build_match_query(term)
+    if not match:
+        return []
+    from .models import Category, Dish
+
+    joins, conditions, params = '', '', [match]
+    if category:
+        joins = (
+            f"JOIN {Dish._meta.db_table} dish ON dish.id = {FTS_TABLE}.rowid "
+            f"JOIN {Category._meta.db_table} category ON category.id = dish.category_id "
+        )
+        conditions = "AND category.name = %s "
+        params.append(category)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} {joins}WHERE {FTS_TABLE} MATCH %s {conditions}"
+            f"ORDER BY bm25({FTS_TABLE}, %s, %s, %s) LIMIT %s",
+            [*params, NAME_WEIGHT, DESCRIPTION_WEIGHT, CATEGORY_WEIGHT, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import images, rollup, search
+from .cache import bump_menu_version
+from .models import Category, Dish, Order, orders_transitioned
+
+
+@receiver(post_save, sender=Dish)
+@receiver(post_delete, sender=Dish)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def menu_changed(sender, instance, **kwargs):
+    # Bump only once the write is visible, so a concurrent reader can't
+    # cache the old menu under the new version.
+    transaction.on_commit(bump_menu_version)
+
+
+@receiver(post_save, sender=Dish)
+def index_dish(sender, instance, **kwargs):
+    search.index_dish(instance)
+
+
+@receiver(post_delete, sender=Dish)
+def unindex_dish(sender, instance, **kwargs):
+    search.remove_dish(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created, **kwargs):
+    if not created:
+        search.reindex_category(instance)
+
+
+@receiver(post_save, sender=Dish)
+@receiver(post_save, sender=Category)
+def build_image_derivatives(sender, instance, **kwargs):
+    images.schedule_derivatives(instance)
+
+
+@receiver(orders_transitioned)
+def update_sales_rollup(sender, order_ids, status, **kwargs):
+    if status == Order.CANCELED:
+        rollup.remove_orders(order_ids)
@@ -1,3 +1,1056 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import events
+
+from . import analytics, images, maintenance, rollup, search
+from .archive import archive_orders
+from .models import (
+    Address, ArchivedOrder, ArchivedOrderItem, Category, CustomUser, DailyDishSales, DiscountCode, Dish,
+    IdempotencyKey, Order, OrderItem, Review, UserDiscount,
+)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class IsolatedCacheTestCase(TestCase):
+    """
+    Runs against a private in-memory cache instead of the shared file cache,
+    emptied before every test so no cached menu outlives its data.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class OrderListQueryCountTests(IsolatedCacheTestCase):
+    """Order lists must not issue queries per order or item."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = CustomUser.objects.create_user(
+            username='kitchen', password='secret', email='kitchen@example.com', role='employee'
+        )
+        cls.customer = CustomUser.objects.create_user(
+            username='customer', password='secret', email='customer@example.com', role='customer'
+        )
+        cls.address = Address.objects.create(user=cls.customer, street='Main St 1', area='Center')
+        category = Category.objects.create(name='Iranian', image='category_images/iranian.jpg')
+        cls.dishes = [
+            Dish.objects.create(name=f'Dish {i}', category=category, price=10 + i, image='dish_images/dish.jpg')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.employee)
+
+    def create_orders(self, count, status):
+        for _ in range(count):
+            order = Order.objects.create(user=self.customer, address=self.address, status=status, total_price=36)
+            for dish in self.dishes:
+                OrderItem.objects.create(order=order, dish=dish, quantity=1)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data['results']
+
+    def assert_constant_queries(self, url, status):
+        # Orders with another status must not show up.
+        self.create_orders(1, 'canceled')
+
+        self.create_orders(2, status)
+        few_queries, results = self.count_queries(url)
+        self.assertEqual(len(results), 2)
+
+        self.create_orders(20, status)
+        many_queries, results = self.count_queries(url)
+        self.assertEqual(len(results), 22)
+        self.assertEqual(many_queries, few_queries)
+
+        order = results[0]
+        self.assertEqual(order['address'], 'Main St 1, Center')
+        self.assertEqual(len(order['items']), 3)
+        self.assertEqual(order['total_price'], 36)
+
+    def test_pending_orders_query_count_is_constant(self):
+        self.assert_constant_queries('/api/orders/', 'pending')
+
+    def test_completed_orders_query_count_is_constant(self):
+        self.assert_constant_queries('/api/completed-orders/', 'completed')
+
+    def test_order_history_query_count_is_constant(self):
+        self.client.force_authenticate(self.customer)
+        self.assert_constant_queries('/api/orders/history/?status=completed', 'completed')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite specific')
+class HotQueryPlanTests(IsolatedCacheTestCase):
+    """The hot order and review queries must be served by an index, never a full table scan."""
+
+    # "SCAN main_order" (or "SCAN TABLE main_order" on older SQLite) without "USING ... INDEX".
+    FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)( AS \w+)?$')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user(
+            username='customer', password='secret', email='customer@example.com', role='customer'
+        )
+        category = Category.objects.create(name='Iranian', image='category_images/iranian.jpg')
+        cls.dish = Dish.objects.create(name='Kebab', category=category, price=10, image='dish_images/dish.jpg')
+
+    def assert_uses_index(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            details = [row[-1] for row in cursor.fetchall()]
+        scans = [detail for detail in details if self.FULL_SCAN.match(detail)]
+        self.assertFalse(scans, f'Full table scan in plan {details} for:\n{sql}')
+
+    def test_orders_by_status(self):
+        self.assert_uses_index(Order.objects.filter(status='pending').order_by('-id')[:51])
+        self.assert_uses_index(Order.objects.filter(status='completed').order_by('-id')[:51])
+
+    def test_customer_history_by_status(self):
+        self.assert_uses_index(
+            Order.objects.filter(user=self.customer, status__in=['completed', 'canceled']).order_by('-id')[:51]
+        )
+
+    def test_orders_in_date_range(self):
+        end = timezone.now()
+        start = end - timedelta(days=7)
+        self.assert_uses_index(Order.objects.filter(created_at__gte=start, created_at__lt=end))
+        self.assert_uses_index(
+            OrderItem.objects.filter(order__created_at__gte=start, order__created_at__lt=end).select_related('dish')
+        )
+
+    def test_stale_pending_orders(self):
+        cutoff = timezone.now() - timedelta(hours=12)
+        self.assert_uses_index(
+            Order.objects.filter(status='pending', created_at__lt=cutoff).order_by('id').values('id')[:500]
+        )
+
+    def test_quantity_per_dish(self):
+        self.assert_uses_index(OrderItem.objects.values('dish').annotate(total=Sum('quantity')).order_by('-total')[:5])
+
+    def test_review_by_user_and_dish(self):
+        self.assert_uses_index(Review.objects.filter(user=self.customer, dish=self.dish))
+
+
+class OrderSalesTests(IsolatedCacheTestCase):
+    """Order status transitions and the daily sales rollup they maintain."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = CustomUser.objects.create_user(
+            username='kitchen', password='secret', email='kitchen@example.com', role='employee'
+        )
+        cls.manager = CustomUser.objects.create_user(
+            username='manager', password='secret', email='manager@example.com', role='manager'
+        )
+        cls.customer = CustomUser.objects.create_user(
+            username='customer', password='secret', email='customer@example.com', role='customer'
+        )
+        category = Category.objects.create(name='Iranian', image='category_images/iranian.jpg')
+        cls.dishes = [
+            Dish.objects.create(name=f'Dish {i}', category=category, price=10 + i, image='dish_images/dish.jpg')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.employee)
+
+    def place_order(self, quantities, created_at=None):
+        """Create an order the way the order view does, including its rollup rows."""
+        order = Order.objects.create(user=self.customer, status=Order.PENDING)
+        for dish, quantity in zip(self.dishes, quantities):
+            if quantity:
+                OrderItem.objects.create(
+                    order=order, dish=dish, quantity=quantity,
+                    unit_price=dish.price, line_total=dish.price * quantity,
+                )
+        if created_at is not None:
+            Order.objects.filter(id=order.id).update(created_at=created_at)
+        rollup.add_orders([order.id])
+        return order
+
+    def rollup_rows(self):
+        # Canceling can leave rows at zero, which a rebuild doesn't create.
+        return sorted(
+            DailyDishSales.objects.exclude(order_count=0)
+            .values_list('date', 'dish_id', 'quantity', 'order_count', 'revenue')
+        )
+
+    def test_transition_of_finished_order_conflicts(self):
+        order = self.place_order([1, 0, 0])
+        url = f'/api/orders/{order.id}/update-status/'
+
+        response = self.client.patch(url, {'status': Order.COMPLETED}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.patch(url, {'status': Order.CANCELED}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['status'], Order.COMPLETED)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.COMPLETED)
+
+        response = self.client.patch(f'/api/orders/{order.id + 1}/update-status/', {'status': Order.CANCELED}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_transition_returns_moved_ids(self):
+        pending = [self.place_order([1, 0, 0]) for _ in range(3)]
+        Order.objects.filter(id=pending[0].id).transition(Order.COMPLETED)
+
+        moved = Order.objects.filter(id__in=[order.id for order in pending]).transition_ids(Order.CANCELED)
+        self.assertEqual(sorted(moved), [pending[1].id, pending[2].id])
+        self.assertEqual(Order.objects.filter(id__in=[order.id for order in pending]).transition(Order.CANCELED), 0)
+
+    def test_transition_of_no_orders_moves_nothing(self):
+        self.assertEqual(Order.objects.none().transition_ids(Order.CANCELED), [])
+        self.assertEqual(Order.objects.filter(id__in=[]).transition(Order.CANCELED), 0)
+        self.assertEqual(Order.objects.all().transition(Order.PENDING), 0)
+
+    def test_transition_without_update_returning(self):
+        orders = [self.place_order([1, 0, 0]) for _ in range(3)]
+        Order.objects.filter(id=orders[0].id).transition(Order.COMPLETED)
+        with mock.patch('main.models.update_returning_supported', return_value=False):
+            moved = Order.objects.filter(id__in=[order.id for order in orders]).transition_ids(Order.CANCELED)
+        self.assertEqual(sorted(moved), [orders[1].id, orders[2].id])
+        self.assertEqual(Order.objects.get(id=orders[0].id).status, Order.COMPLETED)
+
+    def test_bulk_status_reports_what_the_update_moved(self):
+        pending, finished = self.place_order([1, 0, 0]), self.place_order([0, 1, 0])
+        Order.objects.filter(id=finished.id).transition(Order.COMPLETED)
+        missing = finished.id + 1
+        body = {'order_ids': [pending.id, finished.id, missing], 'status': Order.CANCELED}
+
+        self.client.force_authenticate(self.customer)
+        response = self.client.post('/api/orders/bulk-status/', body, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Order.objects.get(id=pending.id).status, Order.PENDING)
+
+        self.client.force_authenticate(self.employee)
+        response = self.client.post('/api/orders/bulk-status/', body, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(response.data['results'], [
+            {'id': pending.id, 'result': 'updated'},
+            {'id': finished.id, 'result': 'conflict', 'status': Order.COMPLETED},
+            {'id': missing, 'result': 'not_found'},
+        ])
+
+    def test_incremental_rollup_matches_rebuild(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        orders = [
+            self.place_order([1, 2, 0]),
+            self.place_order([0, 1, 3]),
+            self.place_order([2, 0, 1], created_at=yesterday),
+            self.place_order([1, 1, 1], created_at=yesterday),
+        ]
+        Order.objects.filter(id=orders[0].id).transition(Order.COMPLETED)
+        Order.objects.filter(id__in=[orders[1].id, orders[3].id]).transition(Order.CANCELED)
+        # Canceling twice must not subtract twice.
+        Order.objects.filter(id=orders[1].id).transition(Order.CANCELED)
+
+        incremental = self.rollup_rows()
+        self.assertTrue(incremental)
+        rollup.rebuild(workers=1)
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_orders_in_date_range_revenue_matches_items(self):
+        today = timezone.localdate()
+        yesterday = timezone.now() - timedelta(days=1)
+        self.place_order([1, 0, 0], created_at=yesterday)
+        canceled = self.place_order([0, 2, 0], created_at=yesterday)
+        Order.objects.filter(id=canceled.id).transition(Order.CANCELED)
+        # Placed today, so outside a range that ends at today.
+        self.place_order([0, 0, 5])
+
+        self.client.force_authenticate(self.manager)
+        response = self.client.get(
+            '/api/orders-in-date-range/',
+            {'start_date': str(today - timedelta(days=1)), 'end_date': str(today)},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['orders']), 1)
+        listed = sum(Decimal(item['line_total']) for item in response.data['orders'])
+        self.assertEqual(Decimal(response.data['total_revenue']), listed)
+        self.assertEqual(listed, Decimal('10.00'))
+
+
+class AnalyticsPermissionTests(IsolatedCacheTestCase):
+    """Sales and dashboard analytics are for managers only."""
+
+    ROUTES = [
+        '/api/analytics/sales/?start=2024-01-01&end=2024-01-08',
+        '/api/analytics/heatmap/',
+        '/api/analytics/basket-sizes/',
+        '/api/analytics/revenue-percentiles/',
+        '/api/analytics/category-trends/',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = CustomUser.objects.create_user(
+            username='manager', password='secret', email='manager@example.com', role='manager'
+        )
+        cls.employee = CustomUser.objects.create_user(
+            username='kitchen', password='secret', email='kitchen@example.com', role='employee'
+        )
+        cls.customer = CustomUser.objects.create_user(
+            username='customer', password='secret', email='customer@example.com', role='customer'
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        # A fresh engine, so no arrays from other tests' rolled back rows leak in.
+        patcher = mock.patch.object(analytics, 'engine', analytics.SalesAnalytics())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_non_managers_are_forbidden(self):
+        for user in [self.customer, self.employee]:
+            self.client.force_authenticate(user)
+            for url in self.ROUTES:
+                with self.subTest(user=user.username, url=url):
+                    self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_manager_reports_are_forbidden_to_customers(self):
+        self.client.force_authenticate(self.customer)
+        for url in ['/api/orders-in-date-range/?start_date=2024-01-01&end_date=2024-01-08', '/api/top-solds/']:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_kitchen_order_routes_are_forbidden_to_customers(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/orders/').status_code, 403)
+        self.assertEqual(self.client.get('/api/completed-orders/').status_code, 403)
+        response = self.client.patch('/api/orders/1/update-status/', {'status': 'completed'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_managers_are_allowed(self):
+        self.client.force_authenticate(self.manager)
+        for url in self.ROUTES:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class OrderExportTests(IsolatedCacheTestCase):
+    """The order export streams CSV under both WSGI and ASGI."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = CustomUser.objects.create_user(
+            username='manager', password='secret', email='manager@example.com', role='manager'
+        )
+        cls.customer = CustomUser.objects.create_user(
+            username='customer', password='secret', email='customer@example.com', role='customer'
+        )
+        cls.token = Token.objects.create(user=cls.manager)
+        category = Category.objects.create(name='Iranian', image='category_images/iranian.jpg')
+        dish = Dish.objects.create(name='Kebab', category=category, price=10, image='dish_images/dish.jpg')
+        cls.orders = []
+        for quantity in [1, 3]:
+            order = Order.objects.create(user=cls.customer, status=Order.COMPLETED, total_price=10 * quantity)
+            OrderItem.objects.create(
+                order=order, dish=dish, quantity=quantity, unit_price=10, line_total=10 * quantity
+            )
+            cls.orders.append(order)
+
+    def export_url(self, **params):
+        today = timezone.localdate()
+        params = {'start': str(today), 'end': str(today + timedelta(days=1)), 'token': self.token.key, **params}
+        return '/api/orders/export/?' + '&'.join(f'{key}={value}' for key, value in params.items())
+
+    def assert_csv(self, content):
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0][:3], ['order_id', 'order_created_at', 'order_status'])
+        self.assertEqual(len(rows), 3)
+        header = rows[0]
+        self.assertEqual(
+            [(int(row[header.index('order_id')]), row[header.index('quantity')], row[header.index('line_total')])
+             for row in rows[1:]],
+            [(self.orders[0].id, '1', '10.00'), (self.orders[1].id, '3', '30.00')],
+        )
+
+    def test_csv_export_streams_under_wsgi(self):
+        response = self.client.get(self.export_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assert_csv(b''.join(response.streaming_content).decode())
+
+    async def test_csv_export_streams_under_asgi(self):
+        response = await AsyncClient().get(self.export_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assert_csv(content)
+
+    def test_export_is_for_managers_only(self):
+        token = Token.objects.create(user=self.customer)
+        self.assertEqual(self.client.get(self.export_url(token=token.key)).status_code, 403)
+        self.assertEqual(self.client.get(self.export_url(output='xml')).status_code, 400)
+
+
+class OrderArchiveTests(IsolatedCacheTestCase):
+    """Archiving moves old finished orders out of the live tables without losing them from history."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user(
+            username='customer', password='secret', email='customer@example.com', role='customer'
+        )
+        category = Category.objects.create(name='Iranian', image='category_images/iranian.jpg')
+        cls.dish = Dish.objects.create(name='Kebab', category=category, price=10, image='dish_images/dish.jpg')
+
+    def create_order(self, status, days_old):
+        order = Order.objects.create(user=self.customer, status=status, total_price=20)
+        OrderItem.objects.create(order=order, dish=self.dish, quantity=2, unit_price=10, line_total=20)
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - timedelta(days=days_old))
+        return order.id
+
+    def test_history_pages_through_live_and_archived_orders(self):
+        # Old finished orders are archived; the old pending one and recent ones stay live,
+        # so the two stores interleave by id.
+        order_ids = [
+            self.create_order(Order.COMPLETED, 400),
+            self.create_order(Order.PENDING, 300),
+            self.create_order(Order.CANCELED, 250),
+            self.create_order(Order.COMPLETED, 200),
+            self.create_order(Order.COMPLETED, 5),
+            self.create_order(Order.CANCELED, 1),
+            self.create_order(Order.PENDING, 0),
+        ]
+        self.assertEqual(archive_orders(timedelta(days=180)), (3, 3))
+        archived = [order_ids[0], order_ids[2], order_ids[3]]
+        self.assertCountEqual(ArchivedOrder.objects.values_list('id', flat=True), archived)
+        self.assertCountEqual(ArchivedOrderItem.objects.values_list('order_id', flat=True), archived)
+        self.assertFalse(Order.objects.filter(id__in=archived).exists())
+
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        url, seen = '/api/orders/history/?page_size=3', []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 3)
+            for order in response.data['results']:
+                self.assertEqual(len(order['items']), 1)
+                seen.append(order['id'])
+            url = response.data['next']
+        self.assertEqual(seen, sorted(order_ids, reverse=True))
+
+        response = client.get('/api/orders/history/?status=completed')
+        self.assertEqual([order['id'] for order in response.data['results']], [order_ids[4], order_ids[3], order_ids[0]])
+
+
+class MenuSnapshotTests(IsolatedCacheTestCase):
+    """Published menu snapshots follow menu and rating changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user(
+            username='customer', password='secret', email='customer@example.com', role='customer'
+        )
+        cls.category = Category.objects.create(name='Iranian', image='category_images/iranian.jpg')
+        cls.dish = Dish.objects.create(name='Kebab', category=cls.category, price=10, image='dish_images/dish.jpg')
+
+    def setUp(self):
+        super().setUp()
+        from api import menu_snapshot
+
+        self.menu_snapshot = menu_snapshot
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings_override = override_settings(MENU_SNAPSHOT_ROOT=self.root, MENU_SNAPSHOT_DELAY=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def current_menu(self):
+        digest = self.menu_snapshot.current_snapshot_hash()
+        with open(os.path.join(self.root, self.menu_snapshot.snapshot_name(digest)), 'rb') as f:
+            return digest, json.load(f)
+
+    def test_snapshot_has_compressed_variants(self):
+        digest, menu = self.current_menu()
+        self.assertEqual([dish['name'] for dish in menu['dishes']], ['Kebab'])
+        path = os.path.join(self.root, self.menu_snapshot.snapshot_name(digest))
+        self.assertTrue(os.path.exists(path + '.gz'))
+        self.assertTrue(os.path.exists(path + '.br'))
+
+    def test_rating_republishes_snapshot(self):
+        self.current_menu()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/rates/{self.dish.id}', {'dish': self.dish.id, 'rating': 4}, format='json')
+        self.assertEqual(response.status_code, 201)
+        _, menu = self.current_menu()
+        self.assertEqual(float(menu['dishes'][0]['average_rating']), 4.0)
+
+    def test_older_publish_does_not_replace_newer_pointer(self):
+        with mock.patch.object(self.menu_snapshot, 'get_menu_version', return_value=200):
+            newer = self.menu_snapshot.publish_menu_snapshot()
+        Dish.objects.filter(id=self.dish.id).update(name='Old kebab')
+        # A publish that read an older version but finished last.
+        with mock.patch.object(self.menu_snapshot, 'get_menu_version', return_value=100):
+            self.assertEqual(self.menu_snapshot.publish_menu_snapshot(), newer)
+        self.assertEqual(self.menu_snapshot.current_snapshot_hash(), newer)
+
+        with mock.patch.object(self.menu_snapshot, 'get_menu_version', return_value=300):
+            self.assertNotEqual(self.menu_snapshot.publish_menu_snapshot(), newer)
+
+
+class MaintenanceTests(IsolatedCacheTestCase):
+    """The sweep tasks clean up only what is past its age."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user(
+            username='customer', password='secret', email='customer@example.com', role='customer'
+        )
+        cls.other = CustomUser.objects.create_user(
+            username='other', password='secret', email='other@example.com', role='customer'
+        )
+
+    def create_order(self, status, age):
+        order = Order.objects.create(user=self.customer, status=status)
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - age)
+        return order.id
+
+    def test_cancel_stale_orders(self):
+        stale = [self.create_order(Order.PENDING, timedelta(hours=13)) for _ in range(3)]
+        fresh = self.create_order(Order.PENDING, timedelta(hours=1))
+        completed = self.create_order(Order.COMPLETED, timedelta(days=2))
+
+        with mock.patch('api.events.order_status_changed') as announce:
+            self.assertEqual(maintenance.cancel_stale_orders(batch_size=2), 3)
+
+        self.assertEqual(set(Order.objects.filter(status=Order.CANCELED).values_list('id', flat=True)), set(stale))
+        self.assertEqual(Order.objects.get(id=fresh).status, Order.PENDING)
+        self.assertEqual(Order.objects.get(id=completed).status, Order.COMPLETED)
+        # Kitchen screens hear about every canceled order.
+        self.assertCountEqual([call.args for call in announce.call_args_list], [(id, Order.CANCELED) for id in stale])
+
+    def test_expire_discount_codes(self):
+        now = timezone.now()
+        expired = DiscountCode.objects.create(code='OLD', discount_percentage=10, expiration_date=now - timedelta(days=1))
+        current = DiscountCode.objects.create(code='NEW', discount_percentage=10, expiration_date=now + timedelta(days=1))
+
+        self.assertEqual(maintenance.expire_discount_codes(), 1)
+        expired.refresh_from_db()
+        current.refresh_from_db()
+        self.assertFalse(expired.is_active)
+        self.assertTrue(current.is_active)
+
+    def test_prune_tokens_user_discounts_and_idempotency_keys(self):
+        old_token = Token.objects.create(user=self.customer)
+        Token.objects.filter(pk=old_token.pk).update(created=timezone.now() - timedelta(days=31))
+        new_token = Token.objects.create(user=self.other)
+
+        now = timezone.now()
+        long_expired = DiscountCode.objects.create(
+            code='OLD', discount_percentage=10, expiration_date=now - timedelta(days=100)
+        )
+        recently_expired = DiscountCode.objects.create(
+            code='RECENT', discount_percentage=10, expiration_date=now - timedelta(days=10)
+        )
+        UserDiscount.objects.create(user=self.customer, discount_code=long_expired, usage_count=1)
+        kept_usage = UserDiscount.objects.create(user=self.customer, discount_code=recently_expired, usage_count=1)
+
+        old_key = IdempotencyKey.objects.create(
+            user=self.customer, key='old', request_hash='0' * 64, response_status=201, response_body={}
+        )
+        IdempotencyKey.objects.filter(pk=old_key.pk).update(created_at=now - timedelta(days=2))
+        new_key = IdempotencyKey.objects.create(
+            user=self.customer, key='new', request_hash='0' * 64, response_status=201, response_body={}
+        )
+
+        call_command('sweep', 'prune_tokens', 'prune_user_discounts', 'prune_idempotency_keys', stdout=io.StringIO())
+
+        self.assertEqual(list(Token.objects.values_list('pk', flat=True)), [new_token.pk])
+        self.assertEqual(list(UserDiscount.objects.values_list('pk', flat=True)), [kept_usage.pk])
+        self.assertEqual(list(IdempotencyKey.objects.values_list('pk', flat=True)), [new_key.pk])
+
+
+class MenuCacheTests(IsolatedCacheTestCase):
+    """Cached menu lists follow menu writes once they commit."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user(
+            username='customer', password='secret', email='customer@example.com', role='customer'
+        )
+        cls.category = Category.objects.create(name='Iranian', image='category_images/iranian.jpg')
+        # Variants marked as built, so dish saves queue no image work.
+        Dish.objects.create(
+            name='Kebab', category=cls.category, price=10, image='dish_images/dish.jpg',
+            image_variants={'source': 'dish_images/dish.jpg'},
+        )
+
+    def setUp(self):
+        super().setUp()
+        # Snapshot publishing has its own tests; keep its timer out of these.
+        publish = mock.patch('api.signals.schedule_publish')
+        publish.start()
+        self.addCleanup(publish.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def dish_names(self):
+        response = self.client.get('/api/customer-dishes/')
+        self.assertEqual(response.status_code, 200)
+        return [dish['name'] for dish in response.data['results']]
+
+    def test_menu_write_invalidates_cached_list(self):
+        self.assertEqual(self.dish_names(), ['Kebab'])
+
+        # Until the write commits the cached list is still served.
+        Dish.objects.create(
+            name='Stew', category=self.category, price=8, image='dish_images/dish.jpg',
+            image_variants={'source': 'dish_images/dish.jpg'},
+        )
+        self.assertEqual(self.dish_names(), ['Kebab'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Dish.objects.filter(name='Stew').get().save()
+        self.assertCountEqual(self.dish_names(), ['Kebab', 'Stew'])
+
+    def test_etag_revalidation(self):
+        response = self.client.get('/api/customer-dishes/')
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        unchanged = self.client.get('/api/customer-dishes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged['ETag'], etag)
+
+        # Each variant of the list has its own tag.
+        compact = self.client.get('/api/customer-dishes/', {'view': 'compact'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(compact.status_code, 200)
+
+        kebab = Dish.objects.get(name='Kebab')
+        kebab.price = 11
+        with self.captureOnCommitCallbacks(execute=True):
+            kebab.save()
+        changed = self.client.get('/api/customer-dishes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(changed.data['results'][0]['price'], '11.00')
+
+
+class OrderEventStreamTests(IsolatedCacheTestCase):
+    """The kitchen event stream delivers order events and resumes by id."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = CustomUser.objects.create_user(
+            username='employee', password='secret', email='employee@example.com', role='employee'
+        )
+        cls.customer = CustomUser.objects.create_user(
+            username='customer', password='secret', email='customer@example.com', role='customer'
+        )
+        cls.token = Token.objects.create(user=cls.employee)
+        cls.customer_token = Token.objects.create(user=cls.customer)
+        cls.order = Order.objects.create(user=cls.customer)
+
+    async def open_stream(self, **params):
+        response = await self.async_client.get('/api/orders/events/', {'token': self.token.key, **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = aiter(response.streaming_content)
+        self.assertEqual(await self.next_frame(frames), 'retry: 3000\n\n')
+        return frames
+
+    async def next_frame(self, frames):
+        return (await asyncio.wait_for(anext(frames), timeout=5)).decode()
+
+    def parse(self, frame):
+        fields = dict(line.split(': ', 1) for line in frame.strip().split('\n'))
+        return fields['id'], fields['event'], json.loads(fields['data'])
+
+    def announce_order(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            events.order_created(self.order)
+
+    async def test_streams_new_orders_and_resumes_after_last_event_id(self):
+        frames = await self.open_stream()
+        try:
+            await sync_to_async(self.announce_order)()
+            event_id, event_type, data = self.parse(await self.next_frame(frames))
+        finally:
+            await frames.aclose()
+        self.assertRegex(event_id, rf'^{events.broker.epoch}:\d+$')
+        self.assertEqual(event_type, events.ORDER_CREATED)
+        self.assertEqual(data['id'], self.order.id)
+
+        # Events published while disconnected are replayed after the last one seen.
+        missed = events.broker.publish(events.ORDER_STATUS_CHANGED, {'id': self.order.id, 'status': Order.COMPLETED})
+        frames = await self.open_stream(last_event_id=event_id)
+        try:
+            replayed = self.parse(await self.next_frame(frames))
+        finally:
+            await frames.aclose()
+        self.assertEqual(replayed, (missed.id, events.ORDER_STATUS_CHANGED, {'id': self.order.id, 'status': Order.COMPLETED}))
+
+    async def test_unknown_epoch_asks_for_a_reset(self):
+        frames = await self.open_stream(last_event_id='00000000:1')
+        try:
+            self.assertEqual(await self.next_frame(frames), events.reset_event())
+        finally:
+            await frames.aclose()
+
+    async def test_rejects_customers(self):
+        response = await self.async_client.get('/api/orders/events/', {'token': self.customer_token.key})
+        self.assertEqual(response.status_code, 403)
+
+    def test_needs_asgi(self):
+        response = self.client.get('/api/orders/events/', {'token': self.token.key})
+        self.assertEqual(response.status_code, 501)
+
+
+class DishRatingStatsTests(IsolatedCacheTestCase):
+    """Stored rating aggregates follow review writes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user(
+            username='alice', password='secret', email='alice@example.com', role='customer'
+        )
+        cls.bob = CustomUser.objects.create_user(
+            username='bob', password='secret', email='bob@example.com', role='customer'
+        )
+        category = Category.objects.create(name='Iranian', image='category_images/iranian.jpg')
+        cls.dish = Dish.objects.create(name='Kebab', category=category, price=10, image='dish_images/dish.jpg')
+
+    def rate(self, user, rating, method='post'):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = getattr(client, method)(f'/api/rates/{self.dish.id}', {'dish': self.dish.id, 'rating': rating})
+        self.assertIn(response.status_code, (200, 201), response.data)
+
+    def assertStats(self, rating_sum, rating_count, average_rating):
+        self.dish.refresh_from_db()
+        self.assertEqual(
+            (self.dish.rating_sum, self.dish.rating_count, self.dish.average_rating),
+            (rating_sum, rating_count, Decimal(average_rating)),
+        )
+
+    def test_new_and_changed_ratings(self):
+        self.rate(self.alice, 4)
+        self.rate(self.bob, 5)
+        self.assertStats(9, 2, '4.50')
+
+        self.rate(self.alice, 1, method='put')
+        self.assertStats(6, 2, '3.00')
+
+    def test_one_update_per_change(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.dish.update_rating_stats(4, count_delta=1)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertStats(4, 1, '4.00')
+
+    def test_no_ratings_left_averages_zero(self):
+        self.dish.update_rating_stats(3, count_delta=1)
+        self.dish.update_rating_stats(-3, count_delta=-1)
+        self.assertStats(0, 0, '0')
+
+
+@unittest.skipUnless(search.fts_available(), 'Full-text search needs the SQLite FTS5 index')
+class DishSearchTests(IsolatedCacheTestCase):
+    """Searches rank full-text matches and filter by category before the limit."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user(
+            username='customer', password='secret', email='customer@example.com', role='customer'
+        )
+        iranian = Category.objects.create(name='Iranian', image='category_images/iranian.jpg')
+        turkish = Category.objects.create(name='Turkish', image='category_images/turkish.jpg')
+        for i in range(5):
+            Dish.objects.create(name=f'Kebab {i}', category=iranian, price=10, image='dish_images/dish.jpg')
+        Dish.objects.create(
+            name='Rice', description='Served with kebab', category=iranian, price=5, image='dish_images/dish.jpg'
+        )
+        cls.adana = Dish.objects.create(name='Adana kebab', category=turkish, price=12, image='dish_images/dish.jpg')
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def search(self, **params):
+        response = self.client.get('/api/customer-dishes/', params)
+        self.assertEqual(response.status_code, 200)
+        return [dish['name'] for dish in response.data['results']]
+
+    def test_name_matches_rank_above_description_matches(self):
+        names = self.search(search='keb')
+        self.assertEqual(len(names), 7)
+        self.assertEqual(names[-1], 'Rice')
+
+    def test_category_filter_applies_before_the_limit(self):
+        # Five better-ranked Iranian matches would fill the page on their own.
+        self.assertEqual(self.search(search='kebab', category='Turkish', page_size=5), ['Adana kebab'])
+        self.assertEqual(len(self.search(search='kebab', category='All', page_size=5)), 5)
+
+    def test_query_syntax_is_treated_as_text(self):
+        self.assertEqual(self.search(search='adana: "kebab'), ['Adana kebab'])
+
+
+class CategorySummaryTests(IsolatedCacheTestCase):
+    """Active categories with their dish count and price range, from one cached query."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user(
+            username='customer', password='secret', email='customer@example.com', role='customer'
+        )
+        iranian = Category.objects.create(name='Iranian', image='category_images/iranian.jpg')
+        Category.objects.create(name='Desserts', image='category_images/desserts.jpg')
+        hidden = Category.objects.create(name='Seasonal', image='category_images/seasonal.jpg', is_active=False)
+        for price in (8, 12, 15):
+            Dish.objects.create(name=f'Dish {price}', category=iranian, price=price, image='dish_images/dish.jpg')
+        Dish.objects.create(name='Hidden', category=hidden, price=30, image='dish_images/dish.jpg')
+
+    def test_summary(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        with self.assertNumQueries(1):
+            response = client.get('/api/categories/summary/')
+        self.assertEqual(response.status_code, 200)
+        summary = [
+            (category['name'], category['dish_count'], category['min_price'], category['max_price'])
+            for category in response.data
+        ]
+        self.assertEqual(summary, [('Iranian', 3, '8.00', '15.00'), ('Desserts', 0, None, None)])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get('/api/categories/summary/').data, response.data)
+
+
+class OrderPlacementTests(IsolatedCacheTestCase):
+    """Orders are placed from the cart with set-based writes in one transaction."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user(
+            username='customer', password='secret', email='customer@example.com', role='customer'
+        )
+        cls.address = Address.objects.create(user=cls.customer, street='Valiasr 1', area='Tehran')
+        category = Category.objects.create(name='Iranian', image='category_images/iranian.jpg')
+        cls.dishes = [
+            Dish.objects.create(name=f'Dish {i}', category=category, price=Decimal('10.50') + i, image='dish_images/dish.jpg')
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def cart(self, *quantities):
+        return {
+            'address': self.address.id,
+            'items': [{'id': dish.id, 'quantity': quantity} for dish, quantity in zip(self.dishes, quantities)],
+        }
+
+    def test_places_order_with_priced_items(self):
+        response = self.client.post('/api/complete-order/', self.cart(2, 1), format='json')
+        self.assertEqual(response.status_code, 200)
+
+        order = Order.objects.get()
+        self.assertEqual(order.total_price, Decimal('32.50'))
+        self.assertEqual(response.data['total_price'], order.total_price)
+        self.assertCountEqual(
+            order.items.values_list('dish_id', 'quantity', 'unit_price', 'line_total'),
+            [(self.dishes[0].id, 2, Decimal('10.50'), Decimal('21.00')), (self.dishes[1].id, 1, Decimal('11.50'), Decimal('11.50'))],
+        )
+
+    def test_query_count_does_not_grow_with_the_cart(self):
+        # Only the order writes; the sales rollup upserts one row per dish.
+        with mock.patch('main.rollup.add_orders'):
+            with CaptureQueriesContext(connection) as one_item:
+                self.client.post('/api/complete-order/', self.cart(1), format='json')
+            with CaptureQueriesContext(connection) as five_items:
+                self.client.post('/api/complete-order/', self.cart(1, 2, 3, 4, 5), format='json')
+        self.assertEqual(len(five_items), len(one_item))
+        self.assertEqual(OrderItem.objects.count(), 6)
+
+    def test_invalid_cart_writes_nothing(self):
+        cart = self.cart(1, 1)
+        cart['items'].append({'id': 0, 'quantity': 1})
+        response = self.client.post('/api/complete-order/', cart, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_retry_with_idempotency_key_replays_the_order(self):
+        first = self.client.post('/api/complete-order/', self.cart(2), format='json', HTTP_IDEMPOTENCY_KEY='cart-1')
+        retry = self.client.post('/api/complete-order/', self.cart(2), format='json', HTTP_IDEMPOTENCY_KEY='cart-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual((retry.status_code, retry['Idempotent-Replayed']), (200, 'true'))
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+
+        other = self.client.post('/api/complete-order/', self.cart(3), format='json', HTTP_IDEMPOTENCY_KEY='cart-1')
+        self.assertEqual(other.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_request_does_not_claim_its_key(self):
+        # The same body fails until its dish exists.
+        missing_id = self.dishes[-1].id + 100
+        cart = {'address': self.address.id, 'items': [{'id': missing_id, 'quantity': 1}]}
+        failed = self.client.post('/api/complete-order/', cart, format='json', HTTP_IDEMPOTENCY_KEY='cart-1')
+        self.assertEqual(failed.status_code, 400)
+
+        Dish.objects.create(id=missing_id, name='New', category=self.dishes[0].category, price=9, image='dish_images/dish.jpg')
+        retry = self.client.post('/api/complete-order/', cart, format='json', HTTP_IDEMPOTENCY_KEY='cart-1')
+        self.assertEqual(retry.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', retry)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class SparseDishFieldsTests(IsolatedCacheTestCase):
+    """Dish lists return, and load, only the fields asked for."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user(
+            username='customer', password='secret', email='customer@example.com', role='customer'
+        )
+        category = Category.objects.create(name='Iranian', image='category_images/iranian.jpg')
+        Dish.objects.create(
+            name='Kebab', description='Grilled', category=category, price=10, image='dish_images/dish.jpg'
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def get_dishes(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/customer-dishes/', params)
+        self.assertEqual(response.status_code, 200)
+        dish_query = next(query['sql'] for query in queries if query['sql'].startswith('SELECT') and 'main_dish' in query['sql'])
+        return response.data['results'], dish_query
+
+    def test_fields_param(self):
+        results, sql = self.get_dishes(fields='id,name,unknown')
+        self.assertEqual(results, [{'id': results[0]['id'], 'name': 'Kebab'}])
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('main_category', sql)
+
+    def test_category_name_joins_its_table(self):
+        results, sql = self.get_dishes(fields='name,categoryName')
+        self.assertEqual(results, [{'name': 'Kebab', 'categoryName': 'Iranian'}])
+        self.assertIn('main_category', sql)
+
+    def test_compact_view(self):
+        results, sql = self.get_dishes(view='compact')
+        self.assertEqual(set(results[0]), {'id', 'name', 'price'})
+        self.assertNotIn('"image_variants"', sql)
+
+    def test_full_representation_by_default(self):
+        results, _ = self.get_dishes()
+        self.assertEqual(set(results[0]), {
+            'id', 'name', 'description', 'category', 'categoryName', 'price', 'image', 'image_srcset',
+            'created_at', 'modified_at', 'average_rating',
+        })
+
+
+class ImageDerivativeTests(IsolatedCacheTestCase):
+    """Uploaded images get resized WebP and JPEG variants once they commit."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
+            name='Iranian', image='category_images/iranian.jpg', image_variants={'source': 'category_images/iranian.jpg'}
+        )
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        # Built inline rather than in the worker pool, into a throwaway media root.
+        settings_override = override_settings(MEDIA_ROOT=root, IMAGE_DERIVATIVE_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        publish = mock.patch('api.signals.schedule_publish')
+        publish.start()
+        self.addCleanup(publish.stop)
+
+    def upload(self, name, size):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'orange').save(buffer, 'PNG')
+        return default_storage.save(f'dish_images/{name}', ContentFile(buffer.getvalue()))
+
+    def create_dish(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            dish = Dish.objects.create(name='Kebab', category=self.category, price=10, image=image)
+        dish.refresh_from_db()
+        return dish
+
+    def test_variants_for_a_large_upload(self):
+        name = self.upload('large.png', (2000, 1000))
+        variants = self.create_dish(name).image_variants
+
+        self.assertEqual(variants['source'], name)
+        self.assertEqual(
+            {variant: variants[variant]['width'] for variant in images.VARIANT_WIDTHS},
+            {'thumb': 160, 'card': 480, 'full': 1280},
+        )
+        with default_storage.open(variants['card']['webp']) as webp:
+            card = Image.open(webp)
+            self.assertEqual((card.format, card.size), ('WEBP', (480, 240)))
+        with default_storage.open(variants['card']['jpeg']) as jpeg:
+            self.assertEqual(Image.open(jpeg).format, 'JPEG')
+
+    def test_small_upload_is_not_upscaled(self):
+        dish = self.create_dish(self.upload('small.png', (300, 200)))
+        self.assertEqual([dish.image_variants[variant]['width'] for variant in images.VARIANT_WIDTHS], [160, 300, 300])
+
+        srcset = images.variant_urls(dish.image_variants, lambda name: f'/media/{name}')
+        self.assertEqual(srcset['webp'].count('w, '), 1)  # 160w and 300w, each listed once
+
+    def test_resave_with_the_same_image_keeps_its_variants(self):
+        dish = self.create_dish(self.upload('large.png', (2000, 1000)))
+        with mock.patch('main.images.generate_derivatives') as generate:
+            with self.captureOnCommitCallbacks(execute=True):
+                dish.price = 12
+                dish.save()
+        generate.assert_not_called()
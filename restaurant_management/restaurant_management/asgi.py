@@ -3,6 +3,14 @@ ASGI config for restaurant_management project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project with it, e.g.::
+
+    uvicorn restaurant_management.asgi:application --host 127.0.0.1 --port 8000
+
+The order event stream only works under ASGI; ``manage.py runserver`` is
+WSGI and gets a 501 from it, on which the kitchen screen falls back to
+polling the order list.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
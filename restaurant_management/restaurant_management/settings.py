@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 import os
+from datetime import timedelta
 from pathlib import Path
 from rest_framework.authentication import TokenAuthentication
+from corsheaders.defaults import default_headers
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -52,10 +54,11 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',  # Add this middleware
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware should come early
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'api.middleware.MenuSnapshotMiddleware',  # WhiteNoise plus published menu snapshots
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 ROOT_URLCONF = 'restaurant_management.urls'
 
@@ -76,6 +79,9 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'restaurant_management.wsgi.application'
+# Serve through ASGI (uvicorn, see asgi.py): the order event stream only
+# works under ASGI and answers 501 under WSGI.
+ASGI_APPLICATION = 'restaurant_management.asgi.application'
 
 
 # Database
@@ -87,6 +93,19 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared by every server process and management command on this host, so a
+# menu or sales version bump made anywhere invalidates cached data
+# everywhere. Switch to a Redis backend when serving from several machines.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
+
 # Password validation
 AUTH_USER_MODEL = 'main.CustomUser'
 
@@ -128,3 +147,40 @@ REST_FRAMEWORK = {
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+
+# Seconds a serialized customer menu stays cached; entries are also
+# invalidated whenever a Dish or Category changes.
+MENU_CACHE_TIMEOUT = 60 * 60
+
+# Threads generating resized dish/category images after upload; 0 builds
+# them inline once the upload's transaction commits.
+IMAGE_DERIVATIVE_WORKERS = 2
+
+# Published customer menu snapshots (see api.menu_snapshot), served by
+# api.middleware.MenuSnapshotMiddleware. Older snapshots are kept for
+# clients still holding a previous hash.
+MENU_SNAPSHOT_ROOT = os.path.join(MEDIA_ROOT, 'menu')
+MENU_SNAPSHOT_URL = MEDIA_URL + 'menu/'
+MENU_SNAPSHOT_KEEP = 5
+# Seconds between the first menu write and publishing its snapshot, so a
+# burst of edits is published once; 0 publishes right after each write.
+MENU_SNAPSHOT_DELAY = 2
+
+# How long a stored Idempotency-Key response is replayed before it expires.
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+# Completed and canceled orders older than this are moved to the archive
+# tables by the archive_orders command (see main.archive).
+ORDER_ARCHIVE_AFTER = timedelta(days=180)
+
+# Cleanup done by the sweep command (see main.maintenance): pending orders
+# older than STALE_ORDER_AGE are canceled, auth tokens older than
+# AUTH_TOKEN_MAX_AGE are deleted, and per-user discount usage is dropped
+# once its code has been expired for USER_DISCOUNT_RETENTION.
+STALE_ORDER_AGE = timedelta(hours=12)
+AUTH_TOKEN_MAX_AGE = timedelta(days=30)
+USER_DISCOUNT_RETENTION = timedelta(days=90)
+
+# Seconds a top-dishes ranking stays cached; new and canceled orders and
+# menu edits invalidate it sooner.
+TOP_DISHES_CACHE_TIMEOUT = 5 * 60